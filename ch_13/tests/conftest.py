@@ -0,0 +1,35 @@
+"""
+Python 3 Object-Oriented Programming
+
+Chapter 13.  Testing Object-Oriented Programs.
+"""
+import os
+import pytest
+from _pytest.config import Config  # pytest.Config is only exported from 7.0
+import sys
+
+
+def pytest_configure(config: Config) -> None:
+    """
+    With ``CI_FAST`` set, skip the ``.pytest_cache`` writes done at the end
+    of every session. The last-failed and new-first plugins are the writers;
+    ``--lf`` and ``--nf`` aren't useful in a throw-away CI run anyway.
+    """
+    if os.environ.get("CI_FAST"):
+        for name in ("lfplugin", "nfplugin"):
+            plugin = config.pluginmanager.get_plugin(name)
+            if plugin is not None:
+                config.pluginmanager.unregister(plugin)
+
+
+def pytest_collection_modifyitems(config: Config, items: list[pytest.Item]) -> None:
+    """
+    Deselect the Pythonista-only tests everywhere else, rather than having
+    each one run far enough to skip itself.
+    """
+    if sys.platform == "ios":
+        return
+    deselected = [item for item in items if "test_pythonista" in item.nodeid]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = [item for item in items if item not in deselected]
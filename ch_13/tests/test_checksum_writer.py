@@ -5,26 +5,63 @@ Chapter 13.  Testing Object-Oriented Programs.
 """
 from __future__ import annotations
 import checksum_writer
+import os
 import pytest
 from pathlib import Path
+import shutil
+import tempfile
 from typing import Iterator
-import sys
+
+
+# O_BINARY (Windows only) keeps the newline out of text-mode translation.
+WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+TEMPLATE_FILES = [
+    ("data.txt", b"Hello, world!\n"),
+    ("checksum.txt", b"data.txt Old_Checksum"),
+]
+
+
+@pytest.fixture(scope="session")
+def checksum_template(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """
+    Build the source directory once. Under pytest-xdist, each worker has
+    its own basetemp inside a shared parent; the template goes in the parent
+    so all the workers use one copy. The template is assembled in a private
+    staging directory and renamed into place: the rename is atomic, so a
+    worker that loses the race simply discards its copy.
+    """
+    root = tmp_path_factory.getbasetemp()
+    if "PYTEST_XDIST_WORKER" in os.environ:
+        root = root.parent
+    template = root / "checksum_template"
+    if not template.exists():
+        staging = tempfile.mkdtemp(dir=root)
+        for name, content in TEMPLATE_FILES:
+            fd = os.open(os.path.join(staging, name), WRITE_FLAGS)
+            try:
+                os.write(fd, content)
+            finally:
+                os.close(fd)
+        try:
+            os.rename(staging, template)
+        except OSError:
+            shutil.rmtree(staging)
+    return template
 
 
 @pytest.fixture
-def working_directory(tmp_path: Path) -> Iterator[tuple[Path, Path]]:
+def working_directory(
+    checksum_template: Path, tmp_path: Path
+) -> Iterator[tuple[Path, Path]]:
     working = tmp_path / "some_directory"
-    working.mkdir()
+    shutil.copytree(checksum_template, working)
     source = working / "data.txt"
-    source.write_bytes(b"Hello, world!\n")
     checksum = working / "checksum.txt"
-    checksum.write_text("data.txt Old_Checksum")
     yield source, checksum
     checksum.unlink()
     source.unlink()
 
 
-@pytest.mark.skipif(sys.version_info < (3, 9), reason="requires python3.9 feature")
 def test_checksum(working_directory: tuple[Path, Path]) -> None:
     source_path, old_checksum_path = working_directory
     checksum_writer.checksum(source_path, old_checksum_path)
@@ -40,19 +77,17 @@ def test_checksum(working_directory: tuple[Path, Path]) -> None:
 
 
 from unittest.mock import Mock, sentinel
-from typing import Any
-
-
-@pytest.fixture
-def mock_hashlib(monkeypatch: Any) -> Mock:
-    mocked_hashlib = Mock(sha256=Mock(return_value=sentinel.checksum))
-    monkeypatch.setattr(checksum_writer, "hashlib", mocked_hashlib)
-    return mocked_hashlib
 
 
-def test_file_checksum(mock_hashlib: Mock, tmp_path: Any) -> None:
+def test_file_checksum(tmp_path: Path) -> None:
     source_file = tmp_path / "some_file"
     source_file.write_text("")
-    cw = checksum_writer.FileChecksum(source_file)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(
+            checksum_writer,
+            "hashlib",
+            Mock(sha256=Mock(return_value=sentinel.checksum)),
+        )
+        cw = checksum_writer.FileChecksum(source_file)
     assert cw.source == source_file
     assert cw.checksum == sentinel.checksum
@@ -9,10 +9,17 @@ from unittest.mock import Mock, patch, call
 import pytest
 
 
+@pytest.fixture(scope="session")
+def _mock_redis_singleton() -> Mock:
+    """Built once; each test gets it back in a freshly reset state."""
+    return Mock(set=Mock(return_value=True))
+
+
 @pytest.fixture
-def mock_redis() -> Mock:
-    mock_redis_instance = Mock(set=Mock(return_value=True))
-    return mock_redis_instance
+def mock_redis(_mock_redis_singleton: Mock) -> Mock:
+    _mock_redis_singleton.reset_mock()
+    _mock_redis_singleton.set.return_value = True
+    return _mock_redis_singleton
 
 
 @pytest.fixture
@@ -5,38 +5,36 @@ Chapter 13.  Testing Object-Oriented Programs.
 """
 from __future__ import annotations
 import logging
-from pathlib import Path
+import log_catcher as log_catcher_module
 import pytest
-import subprocess
-import signal
-import sys
-import time
+import socketserver
+import threading
 import remote_logging_app
-from typing import Iterator, Any
+from typing import Iterable, Iterator, Any
 
 # This is an integration test, and works by starting a log_catcher
 # We can call it the "Catcher in the Sky".
 
 
 @pytest.fixture(scope="session")
-def log_catcher() -> Iterator[None]:
-    server_path = Path("src") / "log_catcher.py"
-    print(f"Starting server {server_path}")
-    p = subprocess.Popen(
-        [sys.executable, str(server_path)],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-    )
-    time.sleep(0.25)
-    yield
-    p.terminate()
-    p.wait()
-    if p.stdout:
-        print(p.stdout.read())
-    assert (
-        p.returncode == 1 if sys.platform == "win32" else -signal.SIGTERM.value
-    ), f"Error in watcher, returncode={p.returncode}"
+def log_catcher(tmp_path_factory: pytest.TempPathFactory) -> Iterator[None]:
+    """Run the catcher's handler in a thread; bind is synchronous, so no wait."""
+    target = tmp_path_factory.mktemp("log_catcher") / "one.log"
+    with target.open("w") as unified_log:
+        log_catcher_module.LogDataCatcher.log_file = unified_log
+        server = socketserver.TCPServer(
+            ("localhost", 18842), log_catcher_module.LogDataCatcher
+        )
+        thread = threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+        print(f"Starting server {server.server_address}")
+        thread.start()
+        yield
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    print(target.read_text())
 
 
 @pytest.fixture
@@ -49,11 +47,9 @@ def logging_config() -> Iterator[None]:
     remote_logging_app.logger.removeHandler(socket_handler)
 
 
-def test_1(log_catcher: None, logging_config: None) -> None:
-    for i in range(10):
+@pytest.mark.parametrize(
+    "values", [range(10), [52 * i for i in range(1, 10)]], ids=["range", "x52"]
+)
+def test_work(log_catcher: None, logging_config: None, values: Iterable[int]) -> None:
+    for i in values:
         r = remote_logging_app.work(i)
-
-
-def test_2(log_catcher: None, logging_config: None) -> None:
-    for i in range(1, 10):
-        r = remote_logging_app.work(52 * i)
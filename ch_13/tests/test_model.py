@@ -6,78 +6,78 @@ Chapter 13.  Testing Object-Oriented Programs.
 from __future__ import annotations
 import pytest
 from model import TrainingKnownSample, UnknownSample
-from model import CD, ED, MD, SD
-from typing import Tuple, TypedDict
+from model import CD, ED, MD, SD, Distance
+from typing import Tuple
 
 
 Known_Unknown = Tuple[TrainingKnownSample, UnknownSample]
 
 
-class Row(TypedDict):
-    species: str
-    sepal_length: float
-    sepal_width: float
-    petal_length: float
-    petal_width: float
+KNOWN_15 = TrainingKnownSample(
+    species="Iris-setosa",
+    sepal_length=5.1,
+    sepal_width=3.5,
+    petal_length=1.4,
+    petal_width=0.2,
+)
+UNKNOWN_15 = UnknownSample(
+    sepal_length=7.9,
+    sepal_width=3.2,
+    petal_length=4.7,
+    petal_width=1.4,
+)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def known_unknown_example_15() -> Known_Unknown:
-    known_row: Row = {
-        "species": "Iris-setosa",
-        "sepal_length": 5.1,
-        "sepal_width": 3.5,
-        "petal_length": 1.4,
-        "petal_width": 0.2,
-    }
-    k = TrainingKnownSample(**known_row)
-    unknown_row = {
-        "sepal_length": 7.9,
-        "sepal_width": 3.2,
-        "petal_length": 4.7,
-        "petal_width": 1.4,
-    }
-    u = UnknownSample(**unknown_row)
-    return k, u
-
-
-def test_cd(known_unknown_example_15: Known_Unknown) -> None:
-    k, u = known_unknown_example_15
-    assert CD().distance(k, u) == pytest.approx(3.3)
+    return KNOWN_15, UNKNOWN_15
 
 
-def test_ed(known_unknown_example_15: Known_Unknown) -> None:
-    k, u = known_unknown_example_15
-    assert ED().distance(k, u) == pytest.approx(4.50111097)
+EXPECTED = {
+    CD: pytest.approx(3.3),
+    ED: pytest.approx(4.50111097),
+    MD: pytest.approx(7.6),
+    SD: pytest.approx(0.2773722627),
+}
 
 
-def test_md(known_unknown_example_15: Known_Unknown) -> None:
+@pytest.mark.parametrize("distance_class", [CD, ED, MD, SD])
+def test_distance(
+    known_unknown_example_15: Known_Unknown, distance_class: type[Distance]
+) -> None:
     k, u = known_unknown_example_15
-    assert MD().distance(k, u) == pytest.approx(7.6)
-
-
-def test_sd(known_unknown_example_15: Known_Unknown) -> None:
-    k, u = known_unknown_example_15
-    assert SD().distance(k, u) == pytest.approx(0.2773722627)
+    assert distance_class().distance(k, u) == EXPECTED[distance_class]
 
 
+from dataclasses import dataclass
 from model import Hyperparameter
 from unittest.mock import Mock, sentinel, call
 
 
-@pytest.fixture
-def sample_data() -> list[Mock]:
-    return [
-        Mock(name="Sample1", species=sentinel.Species3),
-        Mock(name="Sample2", species=sentinel.Species1),
-        Mock(name="Sample3", species=sentinel.Species1),
-        Mock(name="Sample4", species=sentinel.Species1),
-        Mock(name="Sample5", species=sentinel.Species3),
-    ]
+@dataclass(frozen=True)
+class SampleStub:
+    """Classification only reads ``species``; no need for a full Mock."""
+
+    name: str
+    species: object
+
+
+SAMPLES = [
+    SampleStub("Sample1", sentinel.Species3),
+    SampleStub("Sample2", sentinel.Species1),
+    SampleStub("Sample3", sentinel.Species1),
+    SampleStub("Sample4", sentinel.Species1),
+    SampleStub("Sample5", sentinel.Species3),
+]
+
+
+@pytest.fixture(scope="session")
+def sample_data() -> list[SampleStub]:
+    return SAMPLES
 
 
 @pytest.fixture
-def hyperparameter(sample_data: list[Mock]) -> Hyperparameter:
+def hyperparameter(sample_data: list[SampleStub]) -> Hyperparameter:
     mocked_distance = Mock(distance=Mock(side_effect=[11, 1, 2, 3, 13]))
     mocked_training_data = Mock(training=sample_data)
     mocked_weakref = Mock(return_value=mocked_training_data)
@@ -86,7 +86,7 @@ def hyperparameter(sample_data: list[Mock]) -> Hyperparameter:
     return fixture
 
 
-def test_hyperparameter(sample_data: list[Mock], hyperparameter: Mock) -> None:
+def test_hyperparameter(sample_data: list[SampleStub], hyperparameter: Mock) -> None:
     s = hyperparameter.classify(sentinel.Unknown)
     assert s == sentinel.Species1
     assert hyperparameter.algorithm.distance.mock_calls == [
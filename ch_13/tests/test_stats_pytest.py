@@ -7,9 +7,13 @@ import pytest
 from stats import StatsList
 
 
+TEMPLATE = [1, 2, 2, 3, 3, 4]
+
+
 @pytest.fixture
 def valid_stats() -> StatsList:
-    return StatsList([1, 2, 2, 3, 3, 4])
+    """A fresh copy each time: some tests append or remove values."""
+    return StatsList(TEMPLATE)
 
 
 def test_mean(valid_stats: StatsList) -> None:
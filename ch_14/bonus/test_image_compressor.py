@@ -10,17 +10,18 @@ from unittest.mock import AsyncMock, Mock, call
 import image_compressor
 import random
 
-@fixture(params=[16, 32, 64, 128, 256, 384, 512])
+@fixture(scope="session", params=[16, 32, 64, 128, 256, 384, 512])
 def pattern(request):
+    rng = random.Random(request.param)
     def diamond(width, height, h):
         if h < height//2:
             inset = int(((height//2-h) * (width//2))/(height//2))
         else:
             inset = int(((h-height//2) * (width//2))/(height//2))
         row = (
-            [random.randint(0, int(i*255/inset)) for i in range(inset)]
+            [rng.randint(0, int(i*255/inset)) for i in range(inset)]
             + [0xff for j in range(width-2*inset)]
-            + [random.randint(0, int((inset-k)*255/inset)) for k in range(inset)]
+            + [rng.randint(0, int((inset-k)*255/inset)) for k in range(inset)]
         )
         return row
     width = height = request.param
@@ -31,6 +32,52 @@ def pattern(request):
     )
     return width, height, data
 
+@fixture(scope="module")
+def canonical_buffer():
+    return bytes([42]*200 + [43, 44] + [45]*200)
+
+@mark.parametrize(
+    "run_class, start, expected_end, expected_emit",
+    [
+        (image_compressor.Replicate, 0, 128, bytes([0xff, 42])),
+        (image_compressor.Replicate, 128, 200, bytes([0x80 | 71, 42])),
+        (image_compressor.Literal, 199, 202, bytes([0x02, 42, 43, 44])),
+        (image_compressor.Replicate, 202, 330, bytes([0xff, 45])),
+        (image_compressor.Replicate, 330, 402, bytes([0x80 | 71, 45])),
+    ]
+)
+def test_byte_state(canonical_buffer, run_class, start, expected_end, expected_emit):
+    state = run_class(canonical_buffer, start)
+    for index in range(start + 1, len(canonical_buffer)):
+        if state.byte_state(index) != state:
+            break
+    assert state.end == expected_end
+    assert state.emit() == expected_emit
+
+@fixture(scope="session")
+def sample_rows():
+    return {
+        "mixed": bytes([42, 42, 42, 42, 43, 44, 45, 45, 45]),
+        "short_replicate": bytes([42, 42, 43]),
+        "long_replicate": bytes(129*[42]),
+        "literal": bytes([42, 43, 44, 44]),
+    }
+
+@mark.parametrize(
+    "name, expected",
+    [
+        ("mixed", [b'\x83*', b'\x01+,', b'\x82-']),
+        ("short_replicate", [b'\x81*', b'\x00+']),
+        ("long_replicate", [b'\xff*', b'\x00*']),
+        ("literal", [b'\x01*+', b'\x81,']),
+    ]
+)
+def test_rle_compress(sample_rows, name, expected):
+    row = sample_rows[name]
+    runs = [run.emit() for run in image_compressor.rle_compress(row)]
+    assert runs == expected
+    assert image_compressor.rle_decompress(len(row), 1, b"".join(runs)) == row
+
 def test_compress_decompress(pattern):
     width, height, data = pattern
     comp = b"".join(
@@ -40,9 +87,13 @@ def test_compress_decompress(pattern):
     assert decomp == data
 
 
-def test_image_compress_decompress():
+@fixture(scope="session")
+def bricks_image():
     bricks_path = Path.cwd() / "images" / "bricks.bmp"
-    bricks_image = Image.open(bricks_path)
+    with Image.open(bricks_path) as image:
+        return image.copy()
+
+def test_image_compress_decompress(bricks_image):
     width, height = bricks_image.size
     bricks_rle = image_compressor.image_to_rle(bricks_image)
     new_bricks_image = image_compressor.rle_to_image(width, height, bricks_rle)
@@ -6,8 +6,9 @@ Chapter 14.  Concurrency
 import abc
 import asyncio
 from math import hypot
+import httpx
+import numpy as np
 from pathlib import Path
-import urllib.request
 import urllib.parse
 from PIL import Image, ImageDraw, ImageColor
 import subprocess
@@ -32,20 +33,28 @@ class BuildImage(abc.ABC):
         ...
 
     async def convert(self, source: Path, target: Path) -> None:
+        """Decoding and encoding are CPU-bound; keep them off the event loop."""
+        await asyncio.to_thread(self.convert_sync, source, target)
+
+    @staticmethod
+    def convert_sync(source: Path, target: Path) -> None:
         img = Image.open(source)
         img.save(target)
 
 
 class GetXKCD(BuildImage):
-    def __init__(self, target: Path, source: str) -> None:
+    """Downloads share one client, so they overlap on the event loop."""
+    def __init__(self, target: Path, source: str, client: httpx.AsyncClient) -> None:
         super().__init__(target)
         self.url = source
+        self.client = client
         url_path = Path(urllib.parse.urlparse(self.url).path)
         self.source_path = self.target.parent / url_path.name
 
     async def make(self) -> None:
-        with urllib.request.urlopen(self.url) as source:
-            self.source_path.write_bytes(source.read())
+        response = await self.client.get(self.url)
+        response.raise_for_status()
+        self.source_path.write_bytes(response.content)
         await self.convert(self.source_path, self.target)
 
 
@@ -73,7 +82,10 @@ class RunPlantUML(BuildImage):
         print(self.source)
         print(self.target)
         command = ["java", "-jar", str(self.plantjar), "-tpng", str(self.source)]
-        subprocess.run(command, env=env, check=True)
+        process = await asyncio.create_subprocess_exec(*command, env=env)
+        returncode = await process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command)
         await self.convert(self.intermediate, self.target)
 
 
@@ -86,41 +98,44 @@ class DrawPIL(BuildImage):
         image = builder()
         image.save(self.target)
 
+# Colors are parsed once, not on every image build.
+BLACK = ImageColor.getcolor("black", "1")
+WHITE = ImageColor.getcolor("white", "1")
+GRAYS = [
+    ImageColor.getcolor(f"#{g:02x}{g:02x}{g:02x}", "L")
+    for g in range(0, 256, 16)
+] + [
+    ImageColor.getcolor(f"#ffffff", "L")
+]
+
 def bricks() -> Image.Image:
-    black = ImageColor.getcolor("black", "1")
-    white = ImageColor.getcolor("white", "1")
-    img = Image.new("1", (200, 200), color=white)
+    img = Image.new("1", (200, 200), color=WHITE)
     draw = ImageDraw.Draw(img)
-    draw.rectangle([(0, 0), (100, 100)], fill=black)
-    draw.rectangle([(136, 136), (200, 200)], fill=black)
+    draw.rectangle([(0, 0), (100, 100)], fill=BLACK)
+    draw.rectangle([(136, 136), (200, 200)], fill=BLACK)
     return img
 
 def row() -> Image.Image:
-    black = ImageColor.getcolor("black", "1")
-    white = ImageColor.getcolor("white", "1")
     img = Image.new("1", (200, 2))
     draw = ImageDraw.Draw(img)
-    draw.line([(0, 0), (100, 0)], fill=black, width=2)
-    draw.line([(100, 0), (200, 0)], fill=white, width=2)
+    draw.line([(0, 0), (100, 0)], fill=BLACK, width=2)
+    draw.line([(100, 0), (200, 0)], fill=WHITE, width=2)
     return img
 
-import random
 def very_large() -> Image.Image:
-    grays = [
-        ImageColor.getcolor(f"#{g:02x}{g:02x}{g:02x}", "L")
-        for g in range(0, 256, 16)
-    ] + [
-        ImageColor.getcolor(f"#ffffff", "L")
-    ]
     img = Image.new("L", (7200, 5400))
+    # Draw all the sizes, centers, and colors in a few batched calls.
+    rng = np.random.default_rng()
+    rs = rng.integers(16, 32, size=256, endpoint=True) + 1024 - 4 * np.arange(256)
+    xs = rng.integers(rs, 7200 - rs, endpoint=True)
+    ys = rng.integers(rs, 5400 - rs, endpoint=True)
+    neighborhoods = (np.hypot(xs, ys) / hypot(7200, 5400) * len(GRAYS)).astype(int)
+    low = np.maximum(neighborhoods - 2, 0)
+    high = np.minimum(neighborhoods + 2, len(GRAYS))
+    colors = np.array(GRAYS)[rng.integers(low, high)]
+    # PIL's ellipse fill is C code; NumPy masks or per-row spans measured slower.
     draw = ImageDraw.Draw(img)
-    for c in range(256):
-        r = random.randint(16, 32) + 1024-(c*4)
-        x = random.randint(0+r, 7200-r)
-        y = random.randint(0+r, 5400-r)
-        neighborhood = int(hypot(x, y) / hypot(7200, 5400) * len(grays))
-        color_slice = slice(max(neighborhood-2, 0), min(neighborhood+2, len(grays)))
-        color = random.choice(grays[color_slice])
+    for x, y, r, color in zip(xs.tolist(), ys.tolist(), rs.tolist(), colors.tolist()):
         draw.ellipse([(x-r, y-r), (x+r, y+r)], fill=color, outline=color)
     return img
 
@@ -132,43 +147,48 @@ async def make(image: BuildImage) -> None:
 async def main():
     base = Path.cwd()/"images"
 
-    image_list = [
-        GetXKCD(
-            base / "python.bmp",
-            "https://imgs.xkcd.com/comics/python.png"
-        ),
-        GetXKCD(
-            base / "exploits_of_a_mom.bmp",
-            "https://imgs.xkcd.com/comics/exploits_of_a_mom.png"
-        ),
-        GetXKCD(
-            base / "compiling.bmp",
-            "https://imgs.xkcd.com/comics/compiling.png"
-        ),
-        GetXKCD(
-            base / "sandwich.bmp",
-            "https://imgs.xkcd.com/comics/sandwich.png"
-        ),
-        RunPlantUML(
-            base / "bricks_1.bmp", base / "bricks_1.uml"
-        ),
-        RunPlantUML(
-            base / "bricks_2.bmp", base / "bricks_2.uml"
-        ),
-        DrawPIL(
-            base / "bricks.bmp", bricks,
-        ),
-        DrawPIL(
-            base / "row.bmp", row,
-        ),
-        DrawPIL(
-            base / "large.bmp", very_large
-        ),
-    ]
-    workers = [
-        make(image) for image in image_list
-    ]
-    asyncio.gather(*workers)
+    async with httpx.AsyncClient() as client:
+        image_list = [
+            GetXKCD(
+                base / "python.bmp",
+                "https://imgs.xkcd.com/comics/python.png",
+                client
+            ),
+            GetXKCD(
+                base / "exploits_of_a_mom.bmp",
+                "https://imgs.xkcd.com/comics/exploits_of_a_mom.png",
+                client
+            ),
+            GetXKCD(
+                base / "compiling.bmp",
+                "https://imgs.xkcd.com/comics/compiling.png",
+                client
+            ),
+            GetXKCD(
+                base / "sandwich.bmp",
+                "https://imgs.xkcd.com/comics/sandwich.png",
+                client
+            ),
+            RunPlantUML(
+                base / "bricks_1.bmp", base / "bricks_1.uml"
+            ),
+            RunPlantUML(
+                base / "bricks_2.bmp", base / "bricks_2.uml"
+            ),
+            DrawPIL(
+                base / "bricks.bmp", bricks,
+            ),
+            DrawPIL(
+                base / "row.bmp", row,
+            ),
+            DrawPIL(
+                base / "large.bmp", very_large
+            ),
+        ]
+        workers = [
+            asyncio.create_task(make(image)) for image in image_list
+        ]
+        await asyncio.gather(*workers)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -10,9 +10,10 @@ from concurrent import futures
 from fnmatch import fnmatch
 import os
 from pathlib import Path
+import re
 import sys
 import time
-from typing import Iterator, NamedTuple
+from typing import Iterator, NamedTuple, Optional
 
 
 class ImportResult(NamedTuple):
@@ -38,12 +39,77 @@ class ImportVisitor(ast.NodeVisitor):
         if node.module:
             self.imports.add(node.module)
 
+    def generic_visit(self, node: ast.AST) -> None:
+        # Imports are statements, so only descend into statement lists;
+        # expressions can never hold one.
+        for field in ("body", "orelse", "finalbody", "handlers", "cases"):
+            for child in getattr(node, field, ()):
+                self.visit(child)
+
+
+# Comments and string literals; removing them leaves only code to scan.
+NOT_CODE = re.compile(
+    rb"#[^\r\n]*"
+    rb'|"""(?:\\.|[^\\])*?"""'
+    rb"|'''(?:\\.|[^\\])*?'''"
+    rb'|"(?:\\.|[^"\\\r\n])*"'
+    rb"|'(?:\\.|[^'\\\r\n])*'",
+    re.S,
+)
+KEYWORD = re.compile(rb"\bimport\b")
+CANDIDATE = re.compile(rb"^[ \t]*(?:import|from)\b.*$", re.M)
+# The only statement shapes the fast path trusts.
+NAME = rb"[A-Za-z_][\w.]*"
+ALIAS = rb"[ \t]+as[ \t]+\w+"
+SIMPLE_IMPORT = re.compile(
+    rb"[ \t]*import[ \t]+(%s(?:%s)?(?:[ \t]*,[ \t]*%s(?:%s)?)*)[ \t]*"
+    % (NAME, ALIAS, NAME, ALIAS)
+)
+SIMPLE_FROM = re.compile(rb"[ \t]*from[ \t]+(%s)[ \t]+import\b[^;\\]*" % NAME)
+
+
+def scan_imports(source: bytes) -> Optional[set[str]]:
+    """
+    Regular-expression scan for import statements, much cheaper than a parse.
+    Returns None when the source needs a real parse: relative imports,
+    compound lines, ``;`` or ``\\`` continuations, or quoting it can't follow.
+
+    >>> sorted(scan_imports(b"import os.path as p, sys\\nfrom typing import (\\n"))
+    ['os.path', 'sys', 'typing']
+    >>> scan_imports(b"'''\\nimport nothing\\n'''  # import nothing\\n")
+    set()
+    >>> print(scan_imports(b"from . import sibling\\n"))
+    None
+    """
+    code = NOT_CODE.sub(b"", source)
+    if b'"' in code or b"'" in code:
+        return None
+    imports: set[str] = set()
+    statements = 0
+    for candidate in CANDIDATE.finditer(code):
+        line = candidate.group(0).rstrip(b"\r")
+        if match := SIMPLE_IMPORT.fullmatch(line):
+            for clause in match.group(1).split(b","):
+                imports.add(clause.split()[0].decode("ascii"))
+        elif match := SIMPLE_FROM.fullmatch(line):
+            imports.add(match.group(1).decode("ascii"))
+        else:
+            return None
+        statements += 1
+    if len(KEYWORD.findall(code)) != statements:
+        return None
+    return imports
+
 
 def find_imports(path: Path) -> ImportResult:
-    tree = ast.parse(path.read_text())
-    iv = ImportVisitor()
-    iv.visit(tree)
-    return ImportResult(path, iv.imports)
+    source = path.read_bytes()
+    imports = scan_imports(source)
+    if imports is None:
+        tree = ast.parse(source, filename=str(path))
+        iv = ImportVisitor()
+        iv.visit(tree)
+        imports = iv.imports
+    return ImportResult(path, imports)
 
 
 def all_source(path: Path, pattern: str) -> Iterator[Path]:
@@ -63,19 +129,19 @@ def get_options(argv: list[str] = sys.argv[1:]) -> argparse.Namespace:
 def main(base: Path = Path.cwd()) -> None:
     print(f"\n{base}")
     start = time.perf_counter()
-    with futures.ThreadPoolExecutor(24) as pool:
-        analyzers = [
-            pool.submit(find_imports, path) for path in all_source(base, "*.py")
-        ]
-        analyzed = (worker.result() for worker in futures.as_completed(analyzers))
-    for example in sorted(analyzed):
-        print(
-            f"{'->' if example.focus else '':2s} "
-            f"{example.path.relative_to(base)} {example.imports}"
-        )
+    # Sorting the paths up front lets results print as the pool yields them.
+    paths = sorted(all_source(base, "*.py"))
+    count = 0
+    with futures.ProcessPoolExecutor() as pool:
+        analyzed = pool.map(find_imports, paths, chunksize=32)
+        for count, example in enumerate(analyzed, start=1):
+            print(
+                f"{'->' if example.focus else '':2s} "
+                f"{example.path.relative_to(base)} {example.imports}"
+            )
     end = time.perf_counter()
-    rate = 1000 * (end - start) / len(analyzers)
-    print(f"Searched {len(analyzers)} files in {base} at {rate:.3f}ms/file")
+    rate = 1000 * (end - start) / count
+    print(f"Searched {count} files in {base} at {rate:.3f}ms/file")
 
 
 if __name__ == "__main__":
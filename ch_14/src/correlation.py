@@ -4,10 +4,10 @@ Python 3 Object-Oriented Programming
 Chapter 14.  Concurrency
 """
 from __future__ import annotations
-from math import sqrt
 from model import TrainingData, CSVIrisReader, TrainingKnownSample
+import numpy as np
 from pathlib import Path
-from typing import List, NamedTuple, cast
+from typing import cast
 
 SpeciesValue = {
     "Iris-setosa": 1,
@@ -16,37 +16,21 @@ SpeciesValue = {
 }
 
 
-class SpeciesFeature(NamedTuple):
-    tks: TrainingKnownSample
-
-    def species(self) -> int:
-        return SpeciesValue[self.tks.sample.species]
-
-    def feature(self, name: str) -> float:
-        return cast(float, getattr(self.tks.sample.sample, name))
-
-
 def covariance(data: list[TrainingKnownSample], attr: str) -> None:
-    species_feature_data = [SpeciesFeature(tks) for tks in data]
-    n = sum(1 for s in species_feature_data)
-    species_mean = sum(s.species() for s in species_feature_data) / n
-    feature_mean = sum(s.feature(attr) for s in species_feature_data) / n
-    feature_min = min(s.feature(attr) for s in species_feature_data)
-    feature_max = max(s.feature(attr) for s in species_feature_data)
-    species_sd = sqrt(
-        sum((s.species() - species_mean) ** 2 for s in species_feature_data) / n
-    )
-    feature_sd = sqrt(
-        sum((s.feature(attr) - feature_mean) ** 2 for s in species_feature_data) / n
+    species = np.fromiter(
+        (SpeciesValue[tks.sample.species] for tks in data),
+        dtype=np.int8,
+        count=len(data),
     )
-    covariance = (
-        sum(
-            (s.species() - species_mean) * (s.feature(attr) - feature_mean)
-            for s in species_feature_data
-        )
-        / n
+    feature = np.fromiter(
+        (cast(float, getattr(tks.sample.sample, attr)) for tks in data),
+        dtype=np.float64,
+        count=len(data),
     )
-    correlation = covariance / (species_sd * feature_sd)
+    feature_min, feature_max = feature.min(), feature.max()
+    feature_mean = feature.mean()
+    feature_sd = feature.std()
+    correlation = np.corrcoef(species, feature)[0, 1]
     print(
         f"{attr:12s} "
         f"{feature_min:3.1f} {feature_max:3.1f} "
@@ -3,7 +3,8 @@ Python 3 Object-Oriented Programming
 
 Chapter 14. Concurrency
 """
-from threading import Thread, Lock
+from queue import Empty, Queue
+from threading import Thread, Condition
 import time
 from typing import Optional
 
@@ -51,8 +52,10 @@ class Tray:
 
 
 THE_TRAY = Tray()
+TRAY_CV = Condition()
 
-THE_ORDERS = [
+THE_ORDERS: "Queue[str]" = Queue()
+for order in [
     "Reuben",
     "Ham and Cheese",
     "Monte Cristo",
@@ -61,33 +64,46 @@ THE_ORDERS = [
     "Grilled Cheese",
     "French Dip",
     "BLT",
-]
+]:
+    THE_ORDERS.put(order)
 
 
 class Owner(Thread):
     def __init__(self, *chefs: "Chef") -> None:
         super().__init__()
-        self.flag = Lock()
+        self.flag_cv = Condition()
+        self.order_ready = False
         self.chefs = chefs
+        self.working = len(chefs)
         self.next_chef = 0
         self.move_tray()
 
     def move_tray(self) -> None:
-        THE_TRAY.ready_for_chef(self.chefs[self.next_chef])
+        with TRAY_CV:
+            THE_TRAY.ready_for_chef(self.chefs[self.next_chef])
+            TRAY_CV.notify_all()
         self.next_chef = (self.next_chef + 1) % len(self.chefs)
 
     def order_up(self) -> None:
-        self.flag.acquire()
+        with self.flag_cv:
+            self.order_ready = True
+            self.flag_cv.notify_all()
+
+    def chef_done(self) -> None:
+        with self.flag_cv:
+            self.working -= 1
+            self.flag_cv.notify_all()
 
     def run(self) -> None:
-        while any(c.is_alive() for c in self.chefs):
-            if self.flag.locked():
+        while True:
+            with self.flag_cv:
+                self.flag_cv.wait_for(lambda: self.order_ready or self.working == 0)
+                if not self.order_ready:
+                    break
                 print(THE_TRAY.content)
                 THE_TRAY.present()
                 self.move_tray()
-                self.flag.release()
-            # Is it sensible to move the tray here?
-            # What state is the chef in?
+                self.order_ready = False
         print(THE_TRAY.content)
 
 
@@ -96,15 +112,15 @@ class Chef(Thread):
         super().__init__(name=name)
 
     def get_order(self) -> None:
-        self.order = THE_ORDERS.pop(0)
+        self.order = THE_ORDERS.get_nowait()
 
     def prepare(self) -> None:
         time.sleep(1)
         sandwich = Sandwich(self.order)
         pickle = Pickle()
         creation = Creation(self.name, sandwich, pickle)
-        while THE_TRAY.chef_station is not self:
-            time.sleep(1)
+        with TRAY_CV:
+            TRAY_CV.wait_for(lambda: THE_TRAY.chef_station is self)
         THE_TRAY.prepare(creation)
         OWNER.order_up()
 
@@ -113,8 +129,9 @@ class Chef(Thread):
             try:
                 self.get_order()
                 self.prepare()
-            except IndexError:
+            except Empty:
                 break  # No more orders
+        OWNER.chef_done()
 
 
 Mo = Chef("Michael")
@@ -5,12 +5,29 @@ Chapter 14.  Concurrency
 """
 from __future__ import annotations
 import argparse
+import asyncio
 import signal
 import subprocess
 import time
 import sys
 
 
+WAVE = 50
+
+
+async def worker() -> None:
+    w = await asyncio.create_subprocess_exec("python", "src/remote_logging_app.py")
+    await w.wait()
+    print(f"worker {w.pid} finished {w.returncode}")
+
+
+async def run_workers(clients: int) -> None:
+    """Start the workers in waves, reporting each as it finishes."""
+    for start in range(0, clients, WAVE):
+        wave = range(start, min(start + WAVE, clients))
+        await asyncio.gather(*(worker() for i in wave))
+
+
 def main(clients: int = 10) -> None:
     if sys.platform == "win32":
         platform_flags = subprocess.CREATE_NEW_PROCESS_GROUP
@@ -23,14 +40,8 @@ def main(clients: int = 10) -> None:
     time.sleep(0.100)
     # Make sure it didn't crash because of an earlier test
     assert server.poll() is None, f"Server didn't start."
-    workers = [
-        subprocess.Popen(["python", "src/remote_logging_app.py"])
-        for i in range(clients)
-    ]
-    print(f"***{clients} WORKERS STARTED***")
-    for w in workers:
-        w.wait()
-        print(f"worker {w.pid} finished {w.returncode}")
+    print(f"***{clients} WORKERS STARTING***")
+    asyncio.run(run_workers(clients))
     print(f"***{clients} WORKERS FINISHED***")
     # Give the server 100 ms to finish processing
     time.sleep(0.100)
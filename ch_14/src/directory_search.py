@@ -4,25 +4,60 @@ Python 3 Object-Oriented Programming
 Chapter 14.  Concurrency
 """
 from __future__ import annotations
+from concurrent import futures
+import numpy as np
 from pathlib import Path
-from typing import List, Iterator, Optional, Union, TYPE_CHECKING
-
-if TYPE_CHECKING:
-    Query_Q = Queue[Union[str, None]]
-    Result_Q = Queue[List[str]]
-
-
-def search(paths: list[Path], query_q: Query_Q, results_q: Result_Q) -> None:
-    print(f"PID: {os.getpid()}, paths {len(paths)}")
-    lines: list[str] = []
-    for path in paths:
-        lines.extend(l.rstrip() for l in path.read_text().splitlines())
-
-    while True:
-        if (query_text := query_q.get()) is None:
-            break
-        results = [l for l in lines if query_text in l]
-        results_q.put(results)
+import re
+from typing import Iterator, Optional
+
+# Worker process state, set once by the pool initializer.
+shared_text: shared_memory.SharedMemory
+text: memoryview
+line_starts: np.ndarray
+line_ends: np.ndarray
+
+
+def attach(text_name: str, size: int) -> None:
+    """Pool initializer: map the shared text and find the line bounds, once."""
+    global shared_text, text, line_starts, line_ends
+    shared_text = shared_memory.SharedMemory(name=text_name)
+    text = shared_text.buf[:size]
+    print(f"PID: {os.getpid()}, bytes {size}")
+    # The text ends with a newline; find every line's bounds in one pass.
+    line_ends = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == ord("\n"))
+    line_starts = np.concatenate(([0], line_ends + 1))[: len(line_ends)]
+
+
+def search(query_text: str, start: int, end: int) -> list[str]:
+    """Search the lines in bytes start to end of the shared text."""
+    pattern = re.compile(re.escape(query_text.encode()))
+    positions = np.fromiter(
+        (match.start() for match in pattern.finditer(text, start, end)),
+        dtype=np.int64,
+    )
+    positions = positions[positions < end]
+    lines = np.unique(np.searchsorted(line_starts, positions, side="right") - 1)
+    # Convert the bounds to ints in bulk, not one NumPy scalar per line.
+    starts, ends = line_starts[lines].tolist(), line_ends[lines].tolist()
+    return [bytes(text[s:e]).rstrip().decode() for s, e in zip(starts, ends)]
+
+
+def line_chunks(text: bytes, count: int) -> list[tuple[int, int]]:
+    """
+    Split into count ranges of about the same size, each ending at a line end.
+
+    >>> line_chunks(b"one\\ntwo\\nthree\\nfour\\n", 2)
+    [(0, 14), (14, 19)]
+    """
+    bounds = []
+    start = 0
+    for i in range(1, count):
+        split = text.find(b"\n", max(start, len(text) * i // count))
+        end = len(text) if split == -1 else split + 1
+        bounds.append((start, end))
+        start = end
+    bounds.append((start, len(text)))
+    return bounds
 
 
 from fnmatch import fnmatch
@@ -31,40 +66,41 @@ import os
 
 class DirectorySearch:
     def __init__(self) -> None:
-        self.query_queues: list[Query_Q]
-        self.results_queue: Result_Q
-        self.search_workers: list[Process]
+        self.shared_text: shared_memory.SharedMemory
+        self.chunks: list[tuple[int, int]]
+        self.pool: futures.ProcessPoolExecutor
 
     def setup_search(self, paths: list[Path], cpus: Optional[int] = None) -> None:
+        """
+        Read all the files once, into one block of shared memory.
+        Each search request is split into one task per range of lines.
+        """
         if cpus is None:
             cpus = cpu_count()
-        worker_paths = [paths[i::cpus] for i in range(cpus)]
-        self.query_queues = [Queue() for p in range(cpus)]
-        self.results_queue = Queue()
-
-        self.search_workers = [
-            Process(target=search, args=(paths, q, self.results_queue))
-            for paths, q in zip(worker_paths, self.query_queues)
-        ]
-        for proc in self.search_workers:
-            proc.start()
+        contents = [path.read_bytes() for path in paths]
+        text = b"".join(
+            content if content.endswith(b"\n") or not content else content + b"\n"
+            for content in contents
+        )
+        self.shared_text = shared_memory.SharedMemory(create=True, size=len(text) or 1)
+        self.shared_text.buf[: len(text)] = text
+        self.chunks = line_chunks(text, cpus)
+        self.pool = futures.ProcessPoolExecutor(
+            max_workers=cpus,
+            initializer=attach,
+            initargs=(self.shared_text.name, len(text)),
+        )
 
     def teardown_search(self) -> None:
-        # Signal process termination
-        for q in self.query_queues:
-            q.put(None)
-
-        for proc in self.search_workers:
-            proc.join()
+        self.pool.shutdown()
+        self.shared_text.close()
+        self.shared_text.unlink()
 
     def search(self, target: str) -> Iterator[str]:
-        print(f"search queues={self.query_queues}")
-        for q in self.query_queues:
-            q.put(target)
-
-        for i in range(len(self.query_queues)):
-            for match in self.results_queue.get():
-                yield match
+        starts = [start for start, end in self.chunks]
+        ends = [end for start, end in self.chunks]
+        for results in self.pool.map(search, [target] * len(starts), starts, ends):
+            yield from results
 
 
 def all_source(path: Path, pattern: str) -> Iterator[Path]:
@@ -85,7 +121,7 @@ def all_source(path: Path, pattern: str) -> Iterator[Path]:
 #         yield code_path.absolute()
 
 
-from multiprocessing import Process, Queue, cpu_count
+from multiprocessing import cpu_count, shared_memory
 import time
 
 if __name__ == "__main__":
@@ -5,28 +5,32 @@ Chapter 14.  Concurrency
 """
 from __future__ import annotations
 import abc
-import collections
 from concurrent import futures
 import csv
 import datetime
-from math import isclose, hypot
+import multiprocessing
+from functools import cached_property
+import os
+from math import isclose, hypot, sqrt
 from pathlib import Path
 from typing import (
     cast,
     Any,
+    Callable,
     Optional,
     Union,
     Iterator,
     Iterable,
-    Counter,
+    Sequence,
     NamedTuple,
     TextIO,
     TypedDict,
 )
 
-from multiprocessing.shared_memory import ShareableList
+from multiprocessing.shared_memory import SharedMemory
 from multiprocessing.managers import BaseManager, SharedMemoryManager
 from csv import DictReader
+import numpy as np
 
 
 class SharedSamplesCSV:
@@ -53,20 +57,18 @@ class SharedSamplesCSV:
     @classmethod
     def load(
         cls, smm: SharedMemoryManager, source: Iterable[dict[str, str]]
-    ) -> ShareableList[Any]:
+    ) -> "SharedSamplesCSV":
         """
         Usual multiprocessing parent::
 
             with SharedMemoryManager() as smm:
                 with source_path.open() as source:
-                    reader = csv.DictReader(source, SharedSamplesCSV.fieldnames)
-                    data = SharedSamplesCSV.load(smm, reader)
+                    factory = SharedSamplesCSV.load_rows(smm, csv.reader(source))
                 with futures.ProcessPoolExecutor() as workers:
-                    workers.submit(function, data)
+                    workers.submit(function, factory)
 
-        Usual function(data)::
+        Usual function(factory)::
 
-            factory = SharedSamplesCSV(data)
             row = factory.row(i)
 
         Test data can be built like this::
@@ -79,54 +81,123 @@ class SharedSamplesCSV:
             ...      "species": "Iris-setosa"},
             ... ]
             >>> with SharedMemoryManager() as smm:
-            ...     data = SharedSamplesCSV.load(smm, data)
-            ...     factory = SharedSamplesCSV(data)
+            ...     factory = SharedSamplesCSV.load(smm, data)
             ...     factory.row(0)
             ...     KnownSample(factory, 0)
             {'sepal_length': 5.1, 'sepal_width': 3.5, 'petal_length': 1.4, 'petal_width': 0.2, 'species': 'Iris-setosa'}
             KnownSample(sample=Sample(sepal_length=5.1, sepal_width=3.5, petal_length=1.4, petal_width=0.2, ), species='Iris-setosa')
 
         """
-        interim: list[Any] = []
-        for source_dict in source:
-            # Normalize source rows to fixed length and ordering.
-            # TODO: Conversions could be done here.
-            row = [source_dict.get(key, None) for key in cls.fieldnames]
-            interim.extend(row)
-        return smm.ShareableList(interim)
+        return cls.load_rows(
+            smm, ([row[key] for key in cls.fieldnames] for row in source)
+        )
+
+    @classmethod
+    def load_rows(
+        cls, smm: SharedMemoryManager, rows: Iterable[Sequence[Any]]
+    ) -> "SharedSamplesCSV":
+        """Loads positional rows in :attr:`fieldnames` order, e.g., a ``csv.reader``.
+
+        Empty rows, like the blank line ending the Iris data, are skipped.
+        """
+        fields: list[Any] = []
+        # Each distinct species name gets a small integer id, in order of appearance.
+        vocabulary: dict[str, int] = {}
+        species_ids: list[int] = []
+        for row in rows:
+            if not row:
+                continue
+            fields.extend(row[:4])
+            species_ids.append(vocabulary.setdefault(row[4], len(vocabulary)))
+        if len(vocabulary) > 256:
+            raise ValueError(f"{len(vocabulary)} species won't fit in a uint8 id")
+        size = len(species_ids)
+        # Convert once, here, so the workers never parse text.
+        # A single C-level pass of float() over every field.
+        features = np.fromiter(map(float, fields), dtype=np.float64, count=size * 4)
+        # One raw block: the (N, 4) features, then N uint8 species ids.
+        shared = smm.SharedMemory(size=max(size * (4 * 8 + 1), 1))
+        array = np.ndarray((size, 4), dtype=np.float64, buffer=shared.buf)
+        array[:] = features.reshape((size, 4))
+        ids = np.ndarray(
+            (size,), dtype=np.uint8, buffer=shared.buf, offset=size * 4 * 8
+        )
+        ids[:] = species_ids
+        del array, ids
+        return cls(shared.name, size, tuple(vocabulary))
+
+    def __init__(self, shm_name: str, size: int, vocabulary: tuple[str, ...]) -> None:
+        self._size = size
+        self.vocabulary = vocabulary
+        shared = SharedMemory(name=shm_name)
+        # An (N, 4) view of the shared features.
+        self.features: np.ndarray = np.ndarray(
+            (size, 4), dtype=np.float64, buffer=shared.buf
+        )
+        # The same values, flattened; indexing yields a Python float.
+        self.values = shared.buf[: size * 4 * 8].cast("d")
+        # Each row's index into the vocabulary.
+        self.species_ids: np.ndarray = np.ndarray(
+            (size,), dtype=np.uint8, buffer=shared.buf, offset=size * 4 * 8
+        )
+        self._shared = shared
 
-    def __init__(self, shareable: ShareableList[Any]) -> None:
-        self._data = shareable
+    def __reduce__(self) -> tuple[Any, ...]:
+        return self.__class__, (self._shared.name, self._size, self.vocabulary)
+
+    def __del__(self) -> None:
+        # Only the cast memoryview pins the mapping; SharedMemory closes itself.
+        self.values.release()
 
     def __len__(self) -> int:
-        return len(self._data) // len(self.fieldnames)
+        return self._size
+
+    def vector(self, r: int) -> np.ndarray:
+        """The four features of row ``r``, copied out of shared memory.
+
+        A view would outlive the block once ``SharedMemory`` closes it.
+        """
+        vector: np.ndarray = self.features[r].copy()
+        return vector
+
+    def species_id(self, r: int) -> int:
+        return int(self.species_ids[r])
+
+    def species_name(self, species_id: int) -> str:
+        return self.vocabulary[species_id]
+
+    def species(self, r: int) -> str:
+        return self.vocabulary[self.species_id(r)]
 
     def row(self, r: int) -> dict[str, Any]:
-        row_len = len(self.fieldnames)
-        str_row = {
-            name: self._data[r * row_len + offset]
-            for offset, name in enumerate(self.fieldnames)
-        }
-        # TODO: Split out conversions
+        vector = self.features[r].tolist()
+        sepal_length, sepal_width, petal_length, petal_width = vector
         return {
-            "sepal_length": float(str_row["sepal_length"]),
-            "sepal_width": float(str_row["sepal_width"]),
-            "petal_length": float(str_row["petal_length"]),
-            "petal_width": float(str_row["petal_width"]),
-            "species": str_row["species"],
+            "sepal_length": sepal_length,
+            "sepal_width": sepal_width,
+            "petal_length": petal_length,
+            "petal_width": petal_width,
+            "species": self.species(r),
         }
 
     def row_iter(self) -> Iterable[dict[str, Any]]:
-        exemplar = self.fieldnames[0]
         for i in range(len(self)):
             yield self.row(i)
 
 
 class FWSample:
-    """A Flyweight design that relies on a collection of ShareableList instances."""
+    """A Flyweight design that relies on a shared array of sample features."""
+
+    __slots__ = ("_shareable", "_row_num", "_offset")
 
     def __init__(self, shareable: SharedSamplesCSV, row_num: int) -> None:
-        self._data = shareable.row(row_num)
+        self._shareable = shareable
+        self._row_num = row_num
+        self._offset = 4 * row_num
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Only the factory's name and the row number cross process boundaries.
+        return self.__class__, (self._shareable, self._row_num)
 
     def __repr__(self) -> str:
         return (
@@ -139,19 +210,23 @@ class FWSample:
 
     @property
     def sepal_length(self) -> float:
-        return float(self._data["sepal_length"])
+        return self._shareable.values[self._offset]
 
     @property
     def sepal_width(self) -> float:
-        return float(self._data["sepal_width"])
+        return self._shareable.values[self._offset + 1]
 
     @property
     def petal_length(self) -> float:
-        return float(self._data["petal_length"])
+        return self._shareable.values[self._offset + 2]
 
     @property
     def petal_width(self) -> float:
-        return float(self._data["petal_width"])
+        return self._shareable.values[self._offset + 3]
+
+    def vector(self) -> np.ndarray:
+        """The features as a view into the factory's shared array."""
+        return self._shareable.vector(self._row_num)
 
     def astuple(self) -> tuple[float, float, float, float]:
         return (
@@ -173,8 +248,10 @@ class FWSample:
 
 
 class KnownSample:
+    __slots__ = ("_species", "sample")
+
     def __init__(self, shareable: SharedSamplesCSV, row_num: int) -> None:
-        self._data = shareable.row(row_num)
+        self._species = shareable.species(row_num)
         self.sample = FWSample(shareable, row_num)
 
     def __repr__(self) -> str:
@@ -188,7 +265,7 @@ class KnownSample:
 
     @property
     def species(self) -> str:
-        return str(self._data["species"])
+        return self._species
 
     def __lt__(self, other: Any) -> bool:
         if isinstance(other, KnownSample):
@@ -265,6 +342,13 @@ class ClassifiedSample:
         )
 
 
+def absolute_difference(training: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """``abs(training - query)``, computed in place in a single new array."""
+    diff: np.ndarray = np.subtract(training, query)
+    np.abs(diff, out=diff)
+    return diff
+
+
 class Distance(abc.ABC):
     """Definition of a distance computation"""
 
@@ -272,6 +356,29 @@ class Distance(abc.ABC):
     def distance(self, s1: Sample, s2: Sample) -> float:
         ...
 
+    def distance_batch(self, training: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Distances from each (N, 4) ``training`` row to the ``query`` vector."""
+        return self.from_diff(absolute_difference(training, query), training, query)
+
+    def from_diff(
+        self, diff: np.ndarray, training: np.ndarray, query: np.ndarray
+    ) -> np.ndarray:
+        """Distances given ``diff``, the absolute differences ``training - query``.
+
+        Several algorithms can share one ``diff``.
+        For T queries at once, ``query`` is (T, 1, 4), ``diff`` is (T, N, 4),
+        and the result is (T, N).
+        Subclasses replace this row-at-a-time version with NumPy operations.
+        """
+        if query.ndim > 1:
+            return np.array(
+                [self.from_diff(d, training, q[0]) for d, q in zip(diff, query)]
+            )
+        unknown = USample(*query.tolist())
+        return np.array(
+            [self.distance(USample(*row), unknown) for row in training.tolist()]
+        )
+
 
 class ED(Distance):
     def distance(self, s1: Sample, s2: Sample) -> float:
@@ -282,49 +389,62 @@ class ED(Distance):
             s1.petal_width - s2.petal_width,
         )
 
+    def from_diff(
+        self, diff: np.ndarray, training: np.ndarray, query: np.ndarray
+    ) -> np.ndarray:
+        # einsum squares and sums in one pass, without a diff**2 temporary.
+        return cast(np.ndarray, np.sqrt(np.einsum("...j,...j->...", diff, diff)))
+
 
 class MD(Distance):
     def distance(self, s1: Sample, s2: Sample) -> float:
-        return sum(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
+        return (
+            abs(s1.sepal_length - s2.sepal_length)
+            + abs(s1.sepal_width - s2.sepal_width)
+            + abs(s1.petal_length - s2.petal_length)
+            + abs(s1.petal_width - s2.petal_width)
         )
 
+    def from_diff(
+        self, diff: np.ndarray, training: np.ndarray, query: np.ndarray
+    ) -> np.ndarray:
+        return cast(np.ndarray, diff.sum(axis=-1))
+
 
 class CD(Distance):
     def distance(self, s1: Sample, s2: Sample) -> float:
         return max(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
+            abs(s1.sepal_length - s2.sepal_length),
+            abs(s1.sepal_width - s2.sepal_width),
+            abs(s1.petal_length - s2.petal_length),
+            abs(s1.petal_width - s2.petal_width),
         )
 
+    def from_diff(
+        self, diff: np.ndarray, training: np.ndarray, query: np.ndarray
+    ) -> np.ndarray:
+        return cast(np.ndarray, diff.max(axis=-1))
+
 
 class SD(Distance):
     def distance(self, s1: Sample, s2: Sample) -> float:
-        return sum(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
-        ) / sum(
-            [
-                s1.sepal_length + s2.sepal_length,
-                s1.sepal_width + s2.sepal_width,
-                s1.petal_length + s2.petal_length,
-                s1.petal_width + s2.petal_width,
-            ]
+        return (
+            abs(s1.sepal_length - s2.sepal_length)
+            + abs(s1.sepal_width - s2.sepal_width)
+            + abs(s1.petal_length - s2.petal_length)
+            + abs(s1.petal_width - s2.petal_width)
+        ) / (
+            (s1.sepal_length + s2.sepal_length)
+            + (s1.sepal_width + s2.sepal_width)
+            + (s1.petal_length + s2.petal_length)
+            + (s1.petal_width + s2.petal_width)
         )
 
+    def from_diff(
+        self, diff: np.ndarray, training: np.ndarray, query: np.ndarray
+    ) -> np.ndarray:
+        return cast(np.ndarray, diff.sum(axis=-1) / (training + query).sum(axis=-1))
+
 
 test_Mink1 = """
 >>> data = [
@@ -335,8 +455,7 @@ test_Mink1 = """
 ...      "species": "Iris-setosa"}
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
 ...     unknown_row = {"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4}
 ...     u = UnknownSample(USample(**unknown_row))
@@ -369,8 +488,7 @@ class Chebyshev(Distance):
         ...      "species": "Iris-setosa"},
         ... ]
         >>> with SharedMemoryManager() as smm:
-        ...     shareable_data = SharedSamplesCSV.load(smm, data)
-        ...     factory = SharedSamplesCSV(shareable_data)
+        ...     factory = SharedSamplesCSV.load(smm, data)
         ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
         ...     unknown_row = {"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4}
         ...     u = UnknownSample(USample(**unknown_row))
@@ -382,14 +500,17 @@ class Chebyshev(Distance):
 
     def distance(self, s1: Sample, s2: Sample) -> float:
         return max(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
+            abs(s1.sepal_length - s2.sepal_length),
+            abs(s1.sepal_width - s2.sepal_width),
+            abs(s1.petal_length - s2.petal_length),
+            abs(s1.petal_width - s2.petal_width),
         )
 
+    def from_diff(
+        self, diff: np.ndarray, training: np.ndarray, query: np.ndarray
+    ) -> np.ndarray:
+        return cast(np.ndarray, diff.max(axis=-1))
+
 
 class Minkowski(Distance):
     """An abstraction to provide a way to implement Manhattan and Euclidean."""
@@ -399,46 +520,70 @@ class Minkowski(Distance):
     def m(self) -> int:
         ...
 
+    def __init__(self) -> None:
+        # Looked up once here, rather than on every distance() call.
+        self._m = self.m
+        self._inv_m = 1 / self.m
+
     def distance(self, s1: Sample, s2: Sample) -> float:
+        m = self._m
         return (
-            sum(
-                [
-                    abs(s1.sepal_length - s2.sepal_length) ** self.m,
-                    abs(s1.sepal_width - s2.sepal_width) ** self.m,
-                    abs(s1.petal_length - s2.petal_length) ** self.m,
-                    abs(s1.petal_width - s2.petal_width) ** self.m,
-                ]
-            )
-            ** (1 / self.m)
-        )
+            abs(s1.sepal_length - s2.sepal_length) ** m
+            + abs(s1.sepal_width - s2.sepal_width) ** m
+            + abs(s1.petal_length - s2.petal_length) ** m
+            + abs(s1.petal_width - s2.petal_width) ** m
+        ) ** self._inv_m
+
+    def from_diff(
+        self, diff: np.ndarray, training: np.ndarray, query: np.ndarray
+    ) -> np.ndarray:
+        return cast(np.ndarray, (diff**self.m).sum(axis=-1) ** (1 / self.m))
 
 
 class Euclidean(Minkowski):
     m = 2
 
+    def distance(self, s1: Sample, s2: Sample) -> float:
+        # One hypot() call rather than four ** 2 and a ** 0.5.
+        return hypot(
+            s1.sepal_length - s2.sepal_length,
+            s1.sepal_width - s2.sepal_width,
+            s1.petal_length - s2.petal_length,
+            s1.petal_width - s2.petal_width,
+        )
+
 
 class Manhattan(Minkowski):
     m = 1
 
+    def distance(self, s1: Sample, s2: Sample) -> float:
+        return (
+            abs(s1.sepal_length - s2.sepal_length)
+            + abs(s1.sepal_width - s2.sepal_width)
+            + abs(s1.petal_length - s2.petal_length)
+            + abs(s1.petal_width - s2.petal_width)
+        )
+
 
 class Sorensen(Distance):
     def distance(self, s1: Sample, s2: Sample) -> float:
-        return sum(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
-        ) / sum(
-            [
-                s1.sepal_length + s2.sepal_length,
-                s1.sepal_width + s2.sepal_width,
-                s1.petal_length + s2.petal_length,
-                s1.petal_width + s2.petal_width,
-            ]
+        return (
+            abs(s1.sepal_length - s2.sepal_length)
+            + abs(s1.sepal_width - s2.sepal_width)
+            + abs(s1.petal_length - s2.petal_length)
+            + abs(s1.petal_width - s2.petal_width)
+        ) / (
+            (s1.sepal_length + s2.sepal_length)
+            + (s1.sepal_width + s2.sepal_width)
+            + (s1.petal_length + s2.petal_length)
+            + (s1.petal_width + s2.petal_width)
         )
 
+    def from_diff(
+        self, diff: np.ndarray, training: np.ndarray, query: np.ndarray
+    ) -> np.ndarray:
+        return cast(np.ndarray, diff.sum(axis=-1) / (training + query).sum(axis=-1))
+
 
 test_similarity = """
 >>> distances = [2.0, 3.0, 1.0, 3.0]
@@ -470,8 +615,7 @@ class Minkowski_2(Distance):
         ...      "species": "Iris-setosa"},
         ... ]
         >>> with SharedMemoryManager() as smm:
-        ...     shareable_data = SharedSamplesCSV.load(smm, data)
-        ...     factory = SharedSamplesCSV(shareable_data)
+        ...     factory = SharedSamplesCSV.load(smm, data)
         ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
         ...     unknown_row = {"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4}
         ...     u = UnknownSample(USample(**unknown_row))
@@ -490,17 +634,75 @@ class Minkowski_2(Distance):
     def reduction(values: Iterable[float]) -> float:
         ...
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if "distance" not in cls.__dict__ and isinstance(getattr(cls, "m", None), int):
+            setattr(cls, "distance", cls.compile_distance())
+
+    @classmethod
+    def compile_distance(cls) -> Callable[[Any, Sample, Sample], float]:
+        """A ``distance()`` with this class's ``m`` and ``reduction`` folded in.
+
+        For ``m = 1`` and ``reduction = max``, the source is::
+
+            def distance(self, s1, s2):
+                d0 = abs(s1.sepal_length - s2.sepal_length)
+                d1 = abs(s1.sepal_width - s2.sepal_width)
+                d2 = abs(s1.petal_length - s2.petal_length)
+                d3 = abs(s1.petal_width - s2.petal_width)
+                return max(d0, d1, d2, d3)
+
+        There are no ``self`` lookups and no ``**`` for ``m`` of 1 or 2.
+        """
+        m = cast(int, getattr(cls, "m"))
+        reduction = getattr(cls, "reduction")
+        lines = ["def distance(self, s1, s2):"]
+        for i, name in enumerate(SharedSamplesCSV.fieldnames[:4]):
+            diff = f"s1.{name} - s2.{name}"
+            lines.append(f"    d{i} = {diff}" if m == 2 else f"    d{i} = abs({diff})")
+        if m == 1:
+            terms = [f"d{i}" for i in range(4)]
+        elif m == 2:
+            terms = [f"d{i} * d{i}" for i in range(4)]
+        else:
+            terms = [f"d{i} ** {m}" for i in range(4)]
+        if reduction is max:
+            reduced = f"max({', '.join(terms)})"
+        elif reduction is sum:
+            reduced = " + ".join(terms)
+        else:
+            reduced = f"reduction([{', '.join(terms)}])"
+        if m == 1:
+            lines.append(f"    return {reduced}")
+        elif m == 2:
+            lines.append(f"    return sqrt({reduced})")
+        else:
+            lines.append(f"    return ({reduced}) ** {1 / m!r}")
+        namespace: dict[str, Any] = {"reduction": reduction, "sqrt": sqrt}
+        exec("\n".join(lines), namespace)
+        distance = namespace["distance"]
+        distance.__qualname__ = f"{cls.__qualname__}.distance"
+        return cast(Callable[[Any, Sample, Sample], float], distance)
+
+    def __init__(self) -> None:
+        # For a subclass without a compiled distance(), e.g., one where m is a
+        # property, look these up once here rather than on every call.
+        self._m = self.m
+        self._inv_m = 1 / self.m
+        self._reduction = self.reduction
+
     def distance(self, s1: Sample, s2: Sample) -> float:
+        m = self._m
         return (
-            self.reduction(
+            self._reduction(
                 [
-                    abs(s1.sepal_length - s2.sepal_length) ** self.m,
-                    abs(s1.sepal_width - s2.sepal_width) ** self.m,
-                    abs(s1.petal_length - s2.petal_length) ** self.m,
-                    abs(s1.petal_width - s2.petal_width) ** self.m,
+                    abs(s1.sepal_length - s2.sepal_length) ** m,
+                    abs(s1.sepal_width - s2.sepal_width) ** m,
+                    abs(s1.petal_length - s2.petal_length) ** m,
+                    abs(s1.petal_width - s2.petal_width) ** m,
                 ]
             )
-            ** (1 / self.m)
+            ** self._inv_m
         )
 
 
@@ -563,64 +765,192 @@ class Hyperparameter:
 
     def classify(self, unknown: Union[UnknownSample, TestingKnownSample]) -> str:
         """The k-NN algorithm"""
-        sample: Sample
+        query: np.ndarray
         if isinstance(unknown, TestingKnownSample):
-            # Unwrap the Sample inside the TestingKnownSample
-            sample = unknown.sample.sample
+            # The Sample inside the TestingKnownSample is already in shared memory
+            query = unknown.sample.sample.vector()
         else:
-            sample = unknown.sample
-        distances: list[tuple[float, TrainingKnownSample]] = sorted(
-            (
-                (
-                    self.algorithm.distance(known.sample.sample, sample),
-                    known,
-                )
-                for known in self.data.training
-            ),
-        )
-        # print(distances[: self.k])
-        k_nearest = (known.sample.species for d, known in distances[: self.k])
-        frequency: Counter[str] = collections.Counter(k_nearest)
-        best_fit, *others = frequency.most_common()
-        # print(best_fit, others)
-        species, votes = best_fit
-        return species
+            query = np.array(unknown.sample)
+        # One NumPy pass over all the training samples.
+        distances = self.algorithm.distance_batch(self.data.training_array, query)
+        return self.vote(distances)
+
+    def vote(self, distances: np.ndarray) -> str:
+        """The k nearest training samples vote on the species."""
+        return self.data.vocabulary[self.vote_id(distances)]
+
+    def vote_id(self, distances: np.ndarray) -> int:
+        """The winning species, as an index into the training data's vocabulary."""
+        training = self.data.training_array
+        # Partition around the k-th smallest distance; only the samples no
+        # farther than that need ordering. Equal distances are ordered by
+        # the samples' features, the order sorting (distance, known) gives.
+        k = min(self.k, len(distances))
+        kth = np.argpartition(distances, k - 1)[k - 1]
+        candidates = np.flatnonzero(distances <= distances[kth])
+        order = np.lexsort((*training[candidates].T[::-1], distances[candidates]))
+        nearest = candidates[order[:k]]
+        k_nearest: list[int] = self.data.training_ids[nearest].tolist()
+        # Species ids are small, so a list indexed by id counts the votes.
+        votes = [0] * len(self.data.vocabulary)
+        for species_id in k_nearest:
+            votes[species_id] += 1
+        # The first species counted wins a tie, as with most_common().
+        most = max(votes)
+        return next(species_id for species_id in k_nearest if votes[species_id] == most)
 
 
 class TrainingData:
     """A set of training data and testing data with methods to load and test the samples.
 
-    Note that this contains a large number of objects.
-    It fails to make good use of the Flyweight design of
-    the ``FWSample`` class.
-
-    As an exercise, redesign this class to make ``testing``
-    and ``training`` into properties.
-    Each of these should be an iterable that's computed only
-    when needed by scanning the given factory to get
-    flyweight objects from shared memory.
+    ``load()`` records only which rows of the factory are for training and
+    which for testing, and gathers their features and species ids into arrays.
+    The ``training`` and ``testing`` lists of sample objects are properties,
+    built from the factory's flyweights only when something asks for them.
+    They can also be assigned directly, to test with hand-built samples.
     """
 
     def __init__(self, name: str) -> None:
         self.name = name
         self.uploaded: datetime.datetime
         self.tested: datetime.datetime
-        self.training: list[TrainingKnownSample] = []
-        self.testing: list[TestingKnownSample] = []
+        self.factory: Optional[SharedSamplesCSV] = None
+        self.training_idx: np.ndarray = np.empty(0, dtype=np.intp)
+        self.testing_idx: np.ndarray = np.empty(0, dtype=np.intp)
 
     def load(self, factory: SharedSamplesCSV) -> None:
-        """Extract TestingKnownSample and TrainingKnownSample from raw data"""
-        for n in range(len(factory)):
-            if n % 5 == 0:
-                test = TestingKnownSample(KnownSample(factory, n))
-                self.testing.append(test)
-                # print(test)
-            else:
-                train = TrainingKnownSample(KnownSample(factory, n))
-                self.training.append(train)
-                # print(train)
+        """Partition the factory's rows into training and testing samples"""
+        rows = np.arange(len(factory))
+        is_testing = rows % 5 == 0
+        self.factory = factory
+        self.training_idx = rows[~is_testing]
+        self.testing_idx = rows[is_testing]
+        # Gathered once here, so no worker's classify() has to rebuild them.
+        self.training_array = factory.features[self.training_idx]
+        self.training_ids = factory.species_ids[self.training_idx]
+        self.testing_array = factory.features[self.testing_idx]
+        self.testing_ids = factory.species_ids[self.testing_idx]
+        self.vocabulary = factory.vocabulary
         self.uploaded = datetime.datetime.now(tz=datetime.timezone.utc)
 
+    @cached_property
+    def training(self) -> list[TrainingKnownSample]:
+        return [
+            TrainingKnownSample(KnownSample(cast(SharedSamplesCSV, self.factory), n))
+            for n in self.training_idx.tolist()
+        ]
+
+    @cached_property
+    def testing(self) -> list[TestingKnownSample]:
+        return [
+            TestingKnownSample(KnownSample(cast(SharedSamplesCSV, self.factory), n))
+            for n in self.testing_idx.tolist()
+        ]
+
+    @cached_property
+    def training_array(self) -> np.ndarray:
+        """An (N, 4) array of the training samples' features.
+
+        ``load()`` fills this in; it's computed only for hand-built training lists.
+        """
+        return np.array(
+            [
+                [
+                    known.sample.sample.sepal_length,
+                    known.sample.sample.sepal_width,
+                    known.sample.sample.petal_length,
+                    known.sample.sample.petal_width,
+                ]
+                for known in self.training
+            ]
+        ).reshape(len(self.training), 4)
+
+    @cached_property
+    def testing_array(self) -> np.ndarray:
+        """A (T, 4) array of the testing samples' features; see ``training_array``."""
+        return np.array(
+            [test_known.sample.sample.vector() for test_known in self.testing]
+        ).reshape(len(self.testing), 4)
+
+    @cached_property
+    def vocabulary(self) -> tuple[str, ...]:
+        """The distinct species names; ``training_ids`` index into this."""
+        return tuple(dict.fromkeys(known.sample.species for known in self.training))
+
+    @cached_property
+    def training_ids(self) -> np.ndarray:
+        """The training samples' species, as uint8 indices into ``vocabulary``."""
+        ids = {name: i for i, name in enumerate(self.vocabulary)}
+        return np.array(
+            [ids[known.sample.species] for known in self.training], dtype=np.uint8
+        )
+
+    @cached_property
+    def testing_ids(self) -> np.ndarray:
+        """The testing samples' species ids; -1 for a species not in ``vocabulary``."""
+        ids = {name: i for i, name in enumerate(self.vocabulary)}
+        return np.array(
+            [ids.get(test_known.sample.species, -1) for test_known in self.testing],
+            dtype=np.intp,
+        )
+
+    @cached_property
+    def feature_rank(self) -> np.ndarray:
+        """Each training sample's place in a sort by features; equal samples tie."""
+        order = np.lexsort(self.training_array.T[::-1])
+        ordered = self.training_array[order]
+        new = np.ones(len(order), dtype=bool)
+        new[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+        rank = np.empty(len(order), dtype=np.intp)
+        rank[order] = np.cumsum(new)
+        return rank
+
+    def test(self, parameters: Iterable[Hyperparameter]) -> None:
+        """Test several Hyperparameters at once, with whole-array operations.
+
+        The absolute differences between every testing and training sample,
+        a (T, N, 4) array, are computed once. Each distance algorithm reduces
+        them to (T, N) distances and orders each row once; every k using that
+        algorithm then votes from the same ordered neighbors.
+        """
+        parameters = list(parameters)
+        # Votes are compared as ids; a species unseen in training never matches.
+        expected = self.testing_ids
+        queries = self.testing_array.reshape(len(expected), 1, 4)
+        diff = absolute_difference(self.training_array, queries)
+        by_algorithm: dict[type[Distance], list[Hyperparameter]] = {}
+        for h in parameters:
+            by_algorithm.setdefault(type(h.algorithm), []).append(h)
+        for group in by_algorithm.values():
+            distances = group[0].algorithm.from_diff(
+                diff, self.training_array, queries
+            )
+            votes = self.vote_all(distances, [h.k for h in group])
+            for h, winners in zip(group, votes):
+                passes = int(np.count_nonzero(winners == expected))
+                h.quality = passes / len(expected)
+
+    def vote_all(self, distances: np.ndarray, ks: Sequence[int]) -> list[np.ndarray]:
+        """For each k, the species id each row of (T, N) ``distances`` votes for.
+
+        As in ``Hyperparameter.vote_id()``, equal distances are ordered by the
+        samples' features, and a tied vote goes to the species counted first.
+        """
+        k_max = min(max(ks), distances.shape[1])
+        rank = np.broadcast_to(self.feature_rank, distances.shape)
+        nearest = self.training_ids[np.lexsort((rank, distances))[:, :k_max]]
+        # (T, k_max, species): is the j-th nearest neighbor of this species?
+        ballots = nearest[..., np.newaxis] == np.arange(len(self.vocabulary))
+        counts = ballots.cumsum(axis=1)
+        first = ballots.argmax(axis=1)
+        winners = []
+        for k in ks:
+            k = min(k, k_max)
+            # Most votes first, then the earliest first vote.
+            score = counts[:, k - 1, :] * (k_max + 1) - first
+            winners.append(score.argmax(axis=1))
+        return winners
+
     def classify(
         self, parameter: Hyperparameter, unknown: UnknownSample
     ) -> ClassifiedSample:
@@ -629,32 +959,120 @@ class TrainingData:
         )
 
 
+# grid_search_1() forks worker processes that inherit this, or, without fork,
+# each worker builds its own, once, in attach_training().
+# grid_search_2() builds just one, shared by all of its threads.
+worker_training: TrainingData
+
+ALGORITHMS: dict[str, type[Distance]] = {
+    algorithm.__name__: algorithm for algorithm in (ED, MD, CD, SD)
+}
+
+
+def attach_training(factory: SharedSamplesCSV) -> None:
+    """Worker initializer: attach to the shared samples and load them."""
+    global worker_training
+    worker_training = TrainingData("Iris")
+    worker_training.load(factory)
+
+
+def tune(k: int) -> list[tuple[int, str, float]]:
+    """Test one k with every distance algorithm against this worker's TrainingData.
+
+    The TrainingData is only read, never changed; see ``grid_search_1()``.
+    """
+    parameters = [
+        Hyperparameter(k, algorithm(), worker_training)
+        for algorithm in ALGORITHMS.values()
+    ]
+    worker_training.test(parameters)
+    return [
+        (h.k, h.algorithm.__class__.__name__, cast(float, h.quality))
+        for h in parameters
+    ]
+
+
+def load_iris(smm: SharedMemoryManager) -> SharedSamplesCSV:
+    source_path = Path.cwd().parent / "bezdekiris.data"
+    with source_path.open() as source:
+        return SharedSamplesCSV.load_rows(smm, csv.reader(source))
+
+
 def grid_search_1() -> None:
+    """Tune k and the distance algorithm on a pool of worker processes.
+
+    Where the ``fork`` start method is available, the parent loads
+    ``worker_training`` before the pool starts, and each forked worker
+    inherits it copy-on-write: nothing is pickled or reloaded. This relies
+    on ``tune()`` treating the TrainingData as read-only. It writes only to
+    the new Hyperparameter objects it creates, never to the shared samples
+    or arrays, so their pages are never copied. Elsewhere, each worker
+    attaches to the shared memory and loads its own copy.
+    """
     with SharedMemoryManager() as smm:
-        source_path = Path.cwd().parent / "bezdekiris.data"
-        with source_path.open() as source:
-            reader = csv.DictReader(source, SharedSamplesCSV.fieldnames)
-            shareable_data = SharedSamplesCSV.load(
-                cast(SharedMemoryManager, smm), reader
+        factory = load_iris(cast(SharedMemoryManager, smm))
+
+        pool: futures.ProcessPoolExecutor
+        if "fork" in multiprocessing.get_all_start_methods():
+            attach_training(factory)
+            pool = futures.ProcessPoolExecutor(
+                8, mp_context=multiprocessing.get_context("fork")
             )
+        else:
+            pool = futures.ProcessPoolExecutor(
+                8, initializer=attach_training, initargs=(factory,)
+            )
+        tuning_results: list[tuple[int, str, float]] = []
+        with pool as workers:
+            test_runs: list[futures.Future[list[tuple[int, str, float]]]] = []
+            for k in range(1, 41, 2):
+                test_runs.append(workers.submit(tune, k))
+            for f in futures.as_completed(test_runs):
+                tuning_results.extend(f.result())
+        for k, algorithm_name, quality in tuning_results:
+            print(f"{k:2d} {algorithm_name:2s} {quality:.3f}")
 
-        factory = SharedSamplesCSV(shareable_data)
-        td = TrainingData("Iris")
-        td.load(factory)
-        tuning_results: list[Hyperparameter] = []
-        with futures.ProcessPoolExecutor(8) as workers:
-            test_runs: list[futures.Future[Hyperparameter]] = []
+
+def grid_search_2() -> None:
+    """The same search, run on threads sharing one TrainingData.
+
+    The distances and votes are small NumPy computations, so a thread pool
+    skips the process start-up and pickling that ``grid_search_1()`` pays for.
+    """
+    with SharedMemoryManager() as smm:
+        factory = load_iris(cast(SharedMemoryManager, smm))
+        # Loaded once, here; every thread reads the same worker_training.
+        attach_training(factory)
+
+        tuning_results: list[tuple[int, str, float]] = []
+        with futures.ThreadPoolExecutor(os.cpu_count()) as workers:
+            test_runs: list[futures.Future[list[tuple[int, str, float]]]] = []
             for k in range(1, 41, 2):
-                for algo in ED(), MD(), CD(), SD():
-                    h = Hyperparameter(k, algo, td)
-                    test_runs.append(workers.submit(h.test))
+                test_runs.append(workers.submit(tune, k))
             for f in futures.as_completed(test_runs):
-                tuning_results.append(f.result())
-        for result in tuning_results:
-            print(
-                f"{result.k:2d} {result.algorithm.__class__.__name__:2s}"
-                f" {result.quality:.3f}"
-            )
+                tuning_results.extend(f.result())
+        for k, algorithm_name, quality in tuning_results:
+            print(f"{k:2d} {algorithm_name:2s} {quality:.3f}")
+
+
+def grid_search_3() -> None:
+    """The same search as a single ``TrainingData.test()`` call, in this process.
+
+    All 80 parameter combinations share one (T, N, 4) array of differences,
+    and each algorithm's neighbors are ordered once for every k.
+    """
+    with SharedMemoryManager() as smm:
+        factory = load_iris(cast(SharedMemoryManager, smm))
+        training = TrainingData("Iris")
+        training.load(factory)
+        parameters = [
+            Hyperparameter(k, algorithm(), training)
+            for k in range(1, 41, 2)
+            for algorithm in ALGORITHMS.values()
+        ]
+        training.test(parameters)
+        for h in parameters:
+            print(f"{h.k:2d} {h.algorithm.__class__.__name__:2s} {h.quality:.3f}")
 
 
 # Special case, we don't *often* test abstract superclasses.
@@ -668,8 +1086,7 @@ test_Sample = """
 ...      "species": "Iris-setosa"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     x = Sample(factory, 0)
 ...     x
 Sample(sepal_length=1.0, sepal_width=2.0, petal_length=3.0, petal_width=4.0, )
@@ -685,8 +1102,7 @@ test_TrainingKnownSample = """
 ...      "species": "Iris-setosa"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
 ...     s1
 TrainingKnownSample(sample=KnownSample(sample=Sample(sepal_length=5.1, sepal_width=3.5, petal_length=1.4, petal_width=0.2, ), species='Iris-setosa'))
@@ -702,8 +1118,7 @@ test_TestingKnownSample = """
 ...      "species": "Iris-setosa"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     s2 = TestingKnownSample(KnownSample(factory, 0))
 ...     s2
 TestingKnownSample(sample=KnownSample(sample=Sample(sepal_length=5.1, sepal_width=3.5, petal_length=1.4, petal_width=0.2, ), species='Iris-setosa'), classification=None)
@@ -734,8 +1149,7 @@ test_Chebyshev = """
 ...      "species": "Iris-setosa"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
 ...     u = UnknownSample(USample(**{"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4}))
 ...     algorithm = Chebyshev()
@@ -752,8 +1166,7 @@ test_Euclidean = """
 ...      "species": "Iris-setosa"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
 ...     u = UnknownSample(USample(**{"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4}))
 ...     algorithm = Euclidean()
@@ -770,8 +1183,7 @@ test_Manhattan = """
 ...      "species": "Iris-setosa"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
 ...     u = UnknownSample(USample(**{"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4}))
 ...     algorithm = Manhattan()
@@ -788,8 +1200,7 @@ test_Sorensen = """
 ...      "species": "Iris-setosa"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
 ...     u = UnknownSample(USample(**{"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4}))
 ...     algorithm = Sorensen()
@@ -806,8 +1217,7 @@ test_Mink2 = """
 ...      "species": "Iris-setosa"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     s1 = TrainingKnownSample(KnownSample(factory, 0))
 ...     u = UnknownSample(USample(**{"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4}))
 ...     isclose(3.3, CD2().distance(s1.sample.sample, u.sample))
@@ -833,8 +1243,7 @@ test_Hyperparameter = """
 ... ]
 >>> with SharedMemoryManager() as smm:
 ...     td = TrainingData('test')
-...     shareable_data = SharedSamplesCSV.load(smm, data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, data)
 ...     t0 = TestingKnownSample(KnownSample(factory, 0))
 ...     td.testing = [t0]
 ...     t1 = TrainingKnownSample(KnownSample(factory, 1))
@@ -856,8 +1265,7 @@ test_TrainingData = """
 ... {"sepal_length": 7.9, "sepal_width": 3.2, "petal_length": 4.7, "petal_width": 1.4, "species": "Iris-versicolor"},
 ... ]
 >>> with SharedMemoryManager() as smm:
-...     shareable_data = SharedSamplesCSV.load(smm, raw_data)
-...     factory = SharedSamplesCSV(shareable_data)
+...     factory = SharedSamplesCSV.load(smm, raw_data)
 ...     td = TrainingData('test')
 ...     td.load(smm, factory.row_iter())
 ...     h = Hyperparameter(k=3, algorithm=Chebyshev(), training=td)
@@ -9,6 +9,8 @@ import collections
 from concurrent import futures
 import csv
 import datetime
+import heapq
+from functools import cached_property
 from math import isclose, hypot
 from pathlib import Path
 from typing import (
@@ -23,6 +25,7 @@ from typing import (
     Protocol,
     NamedTuple,
 )
+import numpy as np
 
 
 class Sample(NamedTuple):
@@ -126,6 +129,29 @@ class CSVIrisReader:
             reader = csv.DictReader(source_file, self.header)
             yield from reader
 
+    def data_arrays(self) -> tuple[np.ndarray, list[str]]:
+        """The (n, 4) float64 features and the n species names.
+
+        Rows are read positionally, and every feature is converted in a
+        single pass, with no per-row dict.
+        """
+        fields: list[str] = []
+        species: list[str] = []
+        with self.source.open() as source_file:
+            for row in csv.reader(source_file):
+                if not row:
+                    continue
+                fields.extend(row[:4])
+                species.append(row[4])
+        features = np.fromiter(map(float, fields), dtype=np.float64, count=len(fields))
+        return features.reshape(len(species), 4), species
+
+
+def differences(train_X: np.ndarray, test_X: np.ndarray) -> np.ndarray:
+    """The (T, n, 4) absolute differences between T test rows and n training rows."""
+    diff = train_X[np.newaxis, :, :] - test_X[:, np.newaxis, :]
+    return cast(np.ndarray, np.abs(diff))
+
 
 class Distance(abc.ABC):
     """Definition of a distance computation"""
@@ -134,57 +160,78 @@ class Distance(abc.ABC):
     def distance(self, s1: Sample, s2: Sample) -> float:
         ...
 
+    #: For a distance that is a vector norm of the differences, its ``ord``
+    #: for ``np.linalg.norm()``.
+    ORD: Optional[float] = None
+
+    def distance_matrix(self, train_X: np.ndarray, test_X: np.ndarray) -> np.ndarray:
+        """The (T, n) distances from each row of ``test_X`` to each of ``train_X``.
+
+        A distance with an ``ORD`` is one ``np.linalg.norm()`` over the
+        differences. Other subclasses replace this sample-at-a-time version
+        with NumPy broadcasting.
+        """
+        if self.ORD is not None:
+            diff = train_X[np.newaxis, :, :] - test_X[:, np.newaxis, :]
+            return cast(np.ndarray, np.linalg.norm(diff, ord=self.ORD, axis=-1))
+        training = [Sample(*row) for row in train_X.tolist()]
+        return np.array(
+            [
+                [self.distance(known, Sample(*row)) for known in training]
+                for row in test_X.tolist()
+            ]
+        ).reshape(len(test_X), len(train_X))
+
 
 class ED(Distance):
+    ORD = 2
+
     def distance(self, s1: Sample, s2: Sample) -> float:
+        sl1, sw1, pl1, pw1 = s1
+        sl2, sw2, pl2, pw2 = s2
         return hypot(
-            s1.sepal_length - s2.sepal_length,
-            s1.sepal_width - s2.sepal_width,
-            s1.petal_length - s2.petal_length,
-            s1.petal_width - s2.petal_width,
+            sl1 - sl2,
+            sw1 - sw2,
+            pl1 - pl2,
+            pw1 - pw2,
         )
 
 
 class MD(Distance):
+    ORD = 1
+
     def distance(self, s1: Sample, s2: Sample) -> float:
-        return sum(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
-        )
+        sl1, sw1, pl1, pw1 = s1
+        sl2, sw2, pl2, pw2 = s2
+        return abs(sl1 - sl2) + abs(sw1 - sw2) + abs(pl1 - pl2) + abs(pw1 - pw2)
 
 
 class CD(Distance):
+    ORD = np.inf
+
     def distance(self, s1: Sample, s2: Sample) -> float:
+        sl1, sw1, pl1, pw1 = s1
+        sl2, sw2, pl2, pw2 = s2
         return max(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
+            abs(sl1 - sl2),
+            abs(sw1 - sw2),
+            abs(pl1 - pl2),
+            abs(pw1 - pw2),
         )
 
 
 class SD(Distance):
     def distance(self, s1: Sample, s2: Sample) -> float:
-        return sum(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
-        ) / sum(
-            [
-                s1.sepal_length + s2.sepal_length,
-                s1.sepal_width + s2.sepal_width,
-                s1.petal_length + s2.petal_length,
-                s1.petal_width + s2.petal_width,
-            ]
+        sl1, sw1, pl1, pw1 = s1
+        sl2, sw2, pl2, pw2 = s2
+        return (abs(sl1 - sl2) + abs(sw1 - sw2) + abs(pl1 - pl2) + abs(pw1 - pw2)) / (
+            (sl1 + sl2) + (sw1 + sw2) + (pl1 + pl2) + (pw1 + pw2)
+        )
+
+    def distance_matrix(self, train_X: np.ndarray, test_X: np.ndarray) -> np.ndarray:
+        totals = train_X[np.newaxis, :, :] + test_X[:, np.newaxis, :]
+        return cast(
+            np.ndarray, differences(train_X, test_X).sum(axis=-1) / totals.sum(axis=-1)
         )
 
 
@@ -237,14 +284,16 @@ class Chebyshev(Distance):
 
     """
 
+    ORD = np.inf
+
     def distance(self, s1: Sample, s2: Sample) -> float:
+        sl1, sw1, pl1, pw1 = s1
+        sl2, sw2, pl2, pw2 = s2
         return max(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
+            abs(sl1 - sl2),
+            abs(sw1 - sw2),
+            abs(pl1 - pl2),
+            abs(pw1 - pw2),
         )
 
 
@@ -257,17 +306,60 @@ class Minkowski(Distance):
         ...
 
     def distance(self, s1: Sample, s2: Sample) -> float:
+        sl1, sw1, pl1, pw1 = s1
+        sl2, sw2, pl2, pw2 = s2
+        m = self.m
         return (
-            sum(
-                [
-                    abs(s1.sepal_length - s2.sepal_length) ** self.m,
-                    abs(s1.sepal_width - s2.sepal_width) ** self.m,
-                    abs(s1.petal_length - s2.petal_length) ** self.m,
-                    abs(s1.petal_width - s2.petal_width) ** self.m,
-                ]
-            )
-            ** (1 / self.m)
+            abs(sl1 - sl2) ** m
+            + abs(sw1 - sw2) ** m
+            + abs(pl1 - pl2) ** m
+            + abs(pw1 - pw2) ** m
+        ) ** (1 / m)
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if "distance" not in cls.__dict__ and isinstance(getattr(cls, "m", None), int):
+            setattr(cls, "distance", cls.compile_distance())
+
+    @classmethod
+    def compile_distance(cls) -> Callable[[Any, Sample, Sample], float]:
+        """A ``distance()`` with this class's ``m`` folded in.
+
+        For ``m = 1``, the source is::
+
+            def distance(self, s1, s2):
+                sl1, sw1, pl1, pw1 = s1
+                sl2, sw2, pl2, pw2 = s2
+                return abs(sl1 - sl2) + abs(sw1 - sw2) + abs(pl1 - pl2) + abs(pw1 - pw2)
+
+        ``m = 2`` becomes one ``hypot()`` call; other values of ``m`` keep
+        the ``**`` with the exponents as constants.
+        """
+        m = cast(int, getattr(cls, "m"))
+        diffs = [f"{f}1 - {f}2" for f in ("sl", "sw", "pl", "pw")]
+        if m == 1:
+            body = " + ".join(f"abs({d})" for d in diffs)
+        elif m == 2:
+            body = f"hypot({', '.join(diffs)})"
+        else:
+            body = f"({' + '.join(f'abs({d}) ** {m}' for d in diffs)}) ** {1 / m!r}"
+        source = "\n".join(
+            [
+                "def distance(self, s1, s2):",
+                "    sl1, sw1, pl1, pw1 = s1",
+                "    sl2, sw2, pl2, pw2 = s2",
+                f"    return {body}",
+            ]
         )
+        namespace: dict[str, Any] = {"hypot": hypot}
+        exec(source, namespace)
+        distance = namespace["distance"]
+        distance.__qualname__ = f"{cls.__qualname__}.distance"
+        return cast(Callable[[Any, Sample, Sample], float], distance)
+
+    def distance_matrix(self, train_X: np.ndarray, test_X: np.ndarray) -> np.ndarray:
+        diff = train_X[np.newaxis, :, :] - test_X[:, np.newaxis, :]
+        return cast(np.ndarray, np.linalg.norm(diff, ord=self.m, axis=-1))
 
 
 class Euclidean(Minkowski):
@@ -280,20 +372,16 @@ class Manhattan(Minkowski):
 
 class Sorensen(Distance):
     def distance(self, s1: Sample, s2: Sample) -> float:
-        return sum(
-            [
-                abs(s1.sepal_length - s2.sepal_length),
-                abs(s1.sepal_width - s2.sepal_width),
-                abs(s1.petal_length - s2.petal_length),
-                abs(s1.petal_width - s2.petal_width),
-            ]
-        ) / sum(
-            [
-                s1.sepal_length + s2.sepal_length,
-                s1.sepal_width + s2.sepal_width,
-                s1.petal_length + s2.petal_length,
-                s1.petal_width + s2.petal_width,
-            ]
+        sl1, sw1, pl1, pw1 = s1
+        sl2, sw2, pl2, pw2 = s2
+        return (abs(sl1 - sl2) + abs(sw1 - sw2) + abs(pl1 - pl2) + abs(pw1 - pw2)) / (
+            (sl1 + sl2) + (sw1 + sw2) + (pl1 + pl2) + (pw1 + pw2)
+        )
+
+    def distance_matrix(self, train_X: np.ndarray, test_X: np.ndarray) -> np.ndarray:
+        totals = train_X[np.newaxis, :, :] + test_X[:, np.newaxis, :]
+        return cast(
+            np.ndarray, differences(train_X, test_X).sum(axis=-1) / totals.sum(axis=-1)
         )
 
 
@@ -343,13 +431,15 @@ class Minkowski_2(Distance):
         ...
 
     def distance(self, s1: Sample, s2: Sample) -> float:
+        sl1, sw1, pl1, pw1 = s1
+        sl2, sw2, pl2, pw2 = s2
         return (
             self.reduction(
                 [
-                    abs(s1.sepal_length - s2.sepal_length) ** self.m,
-                    abs(s1.sepal_width - s2.sepal_width) ** self.m,
-                    abs(s1.petal_length - s2.petal_length) ** self.m,
-                    abs(s1.petal_width - s2.petal_width) ** self.m,
+                    abs(sl1 - sl2) ** self.m,
+                    abs(sw1 - sw2) ** self.m,
+                    abs(pl1 - pl2) ** self.m,
+                    abs(pw1 - pw2) ** self.m,
                 ]
             )
             ** (1 / self.m)
@@ -402,10 +492,15 @@ class Hyperparameter:
         )
 
     def test(self) -> "Hyperparameter":
-        """Run the entire test suite."""
+        """Run the entire test suite.
+
+        The distances from every testing sample to every training sample
+        are computed at once, as a (T, n) array.
+        """
+        distances = self.algorithm.distance_matrix(self.data.train_X, self.data.test_X)
         pass_count, fail_count = 0, 0
-        for test_known in self.data.testing:
-            test_known.classification = self.classify(test_known)
+        for test_known, row in zip(self.data.testing, distances):
+            test_known.classification = self.vote(row)
             if test_known.matches():
                 pass_count += 1
             else:
@@ -420,23 +515,56 @@ class Hyperparameter:
             sample = unknown.sample.sample
         else:
             sample = unknown.sample
-        distances: list[tuple[float, TrainingKnownSample]] = sorted(
+        # Only the k nearest are needed; nsmallest() keeps a heap of k of them
+        # rather than sorting every distance. Ties order as sorted() would.
+        distance = self.algorithm.distance
+        distances: list[tuple[float, TrainingKnownSample]] = heapq.nsmallest(
+            self.k,
             (
-                (
-                    self.algorithm.distance(known.sample.sample, sample),
-                    known,
-                )
+                (distance(known.sample.sample, sample), known)
                 for known in self.data.training
             ),
         )
-        # print(distances[: self.k])
-        k_nearest = (known.sample.species for d, known in distances[: self.k])
+        # print(distances)
+        k_nearest = (known.sample.species for d, known in distances)
         frequency: Counter[str] = collections.Counter(k_nearest)
         best_fit, *others = frequency.most_common()
         # print(best_fit, others)
         species, votes = best_fit
         return species
 
+    def vote(self, distances: np.ndarray) -> str:
+        """The k-NN vote, given the distances to every training sample.
+
+        Equal distances are ordered by ``train_rank``, as sorting
+        ``(distance, known)`` pairs in ``classify()`` would order them.
+        """
+        # Partition around the k-th smallest distance; only the samples no
+        # farther than that need ordering.
+        k = min(self.k, len(distances))
+        kth = np.argpartition(distances, k - 1)[k - 1]
+        candidates = np.flatnonzero(distances <= distances[kth])
+        order = np.lexsort((self.data.train_rank[candidates], distances[candidates]))
+        nearest = candidates[order[:k]]
+        k_nearest = (self.data.train_species[i] for i in nearest.tolist())
+        frequency: Counter[str] = collections.Counter(k_nearest)
+        best_fit, *others = frequency.most_common()
+        species, votes = best_fit
+        return species
+
+
+def sample_array(
+    samples: Iterable[Union[TrainingKnownSample, TestingKnownSample]],
+) -> np.ndarray:
+    """An (n, 4) float64 array of the samples' features."""
+    samples = list(samples)
+    # Each Sample is a tuple of the four features, in order.
+    return np.fromiter(
+        (value for known in samples for value in known.sample.sample),
+        dtype=np.float64,
+        count=4 * len(samples),
+    ).reshape(len(samples), 4)
+
 
 class TrainingData:
     """A set of training data and testing data with methods to load and test the samples."""
@@ -469,6 +597,62 @@ class TrainingData:
                 self.training.append(train)
                 # print(train)
         self.uploaded = datetime.datetime.now(tz=datetime.timezone.utc)
+        self._build_arrays()
+
+    def load_arrays(self, features: np.ndarray, species: list[str]) -> None:
+        """Load from ``CSVIrisReader.data_arrays()``; every fifth row is testing.
+
+        The feature arrays are sliced from ``features`` rather than
+        gathered again from the samples.
+        """
+        testing = np.arange(len(species)) % 5 == 0
+        for row, name, is_test in zip(features.tolist(), species, testing.tolist()):
+            ks = KnownSample(sample=Sample(*row), species=name)
+            if is_test:
+                self.testing.append(TestingKnownSample(ks))
+            else:
+                self.training.append(TrainingKnownSample(ks))
+        self.uploaded = datetime.datetime.now(tz=datetime.timezone.utc)
+        self.train_X = features[~testing]
+        self.train_species = [known.sample.species for known in self.training]
+        self.test_X = features[testing]
+
+    def _build_arrays(self) -> None:
+        """Gather the loaded samples into arrays, once, so each test() needn't.
+
+        These are pickled along with this object for each worker process.
+        """
+        self.train_X = sample_array(self.training)
+        self.train_species = [known.sample.species for known in self.training]
+        self.test_X = sample_array(self.testing)
+
+    # For hand-built ``training`` and ``testing`` lists, these are
+    # computed when first needed.
+
+    @cached_property
+    def train_X(self) -> np.ndarray:
+        return sample_array(self.training)
+
+    @cached_property
+    def train_species(self) -> list[str]:
+        return [known.sample.species for known in self.training]
+
+    @cached_property
+    def test_X(self) -> np.ndarray:
+        return sample_array(self.testing)
+
+    @cached_property
+    def train_rank(self) -> np.ndarray:
+        """Each training sample's position in the sorted training samples.
+
+        Equal samples share a rank.
+        """
+        order = sorted(range(len(self.training)), key=self.training.__getitem__)
+        rank = np.zeros(len(self.training), dtype=np.intp)
+        for previous, current in zip(order, order[1:]):
+            same = self.training[previous] == self.training[current]
+            rank[current] = rank[previous] + (0 if same else 1)
+        return rank
 
     def classify(
         self, parameter: Hyperparameter, unknown: UnknownSample
@@ -478,51 +662,68 @@ class TrainingData:
         )
 
 
-def grid_search_1() -> None:
+worker_training: TrainingData
+
+
+def attach_training(training: TrainingData) -> None:
+    """Worker initializer: keep one TrainingData for every task in this process."""
+    global worker_training
+    worker_training = training
+
+
+def load_training() -> None:
+    """Worker initializer: read the source file once for this process."""
     td = TrainingData("Iris")
     source_path = Path.cwd().parent / "bezdekiris.data"
     reader = CSVIrisReader(source_path)
-    td.load(reader.data_iter())
-    tuning_results: list[Hyperparameter] = []
-    with futures.ProcessPoolExecutor(8) as workers:
-        test_runs: list[futures.Future[Hyperparameter]] = []
-        for k in range(1, 41, 2):
-            for algo in ED(), MD(), CD(), SD():
-                h = Hyperparameter(k, algo, td)
-                test_runs.append(workers.submit(h.test))
-        for f in futures.as_completed(test_runs):
-            tuning_results.append(f.result())
-    for result in tuning_results:
-        print(
-            f"{result.k:2d} {result.algorithm.__class__.__name__:2s}"
-            f" {result.quality:.3f}"
-        )
+    td.load_arrays(*reader.data_arrays())
+    attach_training(td)
+
+
+def tune(k: int, distance_algo: str) -> tuple[int, str, float]:
+    """Test one hyperparameter against this worker's ``worker_training``."""
+    algo = eval(distance_algo)()
+    h = Hyperparameter(k, algo, worker_training)
+    h.test()
+    return k, distance_algo, cast(float, h.quality)
 
 
-def load_and_tune(k: int, distance_algo: str) -> tuple[int, str, float]:
+def grid_search_1() -> None:
     """
-    Variant 2:
-    Build a TrainingData and Hyperparameter object from the source file
-    and the parameters.
-    Works for very small datasets, where the load time is minimal.
-    Doesn't work for large datasets, where shared memory is required.
+    Variant 1:
+    Load the TrainingData here, and hand it to each worker process once,
+    when the worker starts. The tasks are only ``(k, algorithm name)``
+    pairs, so the samples aren't pickled again for every task.
     """
-    algo = eval(distance_algo)()
     td = TrainingData("Iris")
     source_path = Path.cwd().parent / "bezdekiris.data"
     reader = CSVIrisReader(source_path)
-    td.load(reader.data_iter())
-    h = Hyperparameter(k, algo, td)
-    h.test()
-    return k, distance_algo, cast(float, h.quality)
+    td.load_arrays(*reader.data_arrays())
+    with futures.ProcessPoolExecutor(
+        8, initializer=attach_training, initargs=(td,)
+    ) as workers:
+        test_runs: list[futures.Future[tuple[int, str, float]]] = []
+        for k in range(1, 41, 2):
+            for algo in ED, MD, CD, SD:
+                test_runs.append(workers.submit(tune, k, algo.__name__))
+        for f in futures.as_completed(test_runs):
+            k, algo_name, quality = f.result()
+            print(f"{k:2d} {algo_name:2s} {quality:.3f}")
 
 
 def grid_search_2() -> None:
-    with futures.ProcessPoolExecutor(8) as workers:
+    """
+    Variant 2:
+    Each worker process builds its own TrainingData from the source file,
+    once, when it starts.
+    Works for very small datasets, where the load time is minimal.
+    Doesn't work for large datasets, where shared memory is required.
+    """
+    with futures.ProcessPoolExecutor(8, initializer=load_training) as workers:
         test_runs: list[futures.Future[tuple[int, str, float]]] = []
         for k in range(1, 41, 2):
             for algo in ED, MD, CD, SD:
-                test_runs.append(workers.submit(load_and_tune, k, algo.__name__))
+                test_runs.append(workers.submit(tune, k, algo.__name__))
         for f in futures.as_completed(test_runs):
             k, algo_name, quality = f.result()
             print(f"{k:2d} {algo_name:2s} {quality:.3f}")
@@ -12,24 +12,26 @@ from typing import List, DefaultDict, Iterator
 FORKS: List[asyncio.Lock]
 
 
-async def philosopher(id: int, footman: asyncio.Semaphore) -> tuple[int, float, float]:
-    async with footman:
-        async with FORKS[id], FORKS[(id + 1) % len(FORKS)]:
-            eat_time = 1 + random.random()
-            print(f"{id} eating")
-            await asyncio.sleep(eat_time)
-        think_time = 1 + random.random()
-        print(f"{id} philosophizing")
-        await asyncio.sleep(think_time)
+async def philosopher(id: int) -> tuple[int, float, float]:
+    # Always take the lower-numbered fork first. The last philosopher reaches
+    # for fork 0 before fork n-1, which breaks the circular wait without a
+    # footman limiting how many can sit down.
+    first, second = sorted((id, (id + 1) % len(FORKS)))
+    async with FORKS[first], FORKS[second]:
+        eat_time = 1 + random.random()
+        print(f"{id} eating")
+        await asyncio.sleep(eat_time)
+    think_time = 1 + random.random()
+    print(f"{id} philosophizing")
+    await asyncio.sleep(think_time)
     return id, eat_time, think_time
 
 
 async def main(faculty: int = 5, servings: int = 5) -> None:
     global FORKS
     FORKS = [asyncio.Lock() for i in range(faculty)]
-    footman = asyncio.BoundedSemaphore(faculty - 1)
     for serving in range(servings):
-        department = (philosopher(p, footman) for p in range(faculty))
+        department = (philosopher(p) for p in range(faculty))
         results = await asyncio.gather(*department)
         print(results)
 
@@ -4,7 +4,6 @@ Python 3 Object-Oriented Programming
 Chapter 14.  Concurrency
 """
 from __future__ import annotations
-from math import sqrt, ceil
 import random
 from multiprocessing.pool import Pool
 
@@ -16,17 +15,20 @@ def prime_factors(value: int) -> list[int]:
     >>> set(prime_factors(97))
     {97}
     """
-    if value in {2, 3}:
-        return [value]
     factors: list[int] = []
-    for divisor in range(2, ceil(sqrt(value)) + 1):
-        quotient, remainder = divmod(value, divisor)
-        if not remainder:
-            factors.extend(prime_factors(divisor))
-            factors.extend(prime_factors(quotient))
-            break
-    else:
-        factors = [value]
+    # Divide out each factor as it's found, smallest first; whatever is left
+    # once divisor**2 exceeds it is itself prime.
+    while value % 2 == 0 and value > 2:
+        factors.append(2)
+        value //= 2
+    divisor = 3
+    while divisor * divisor <= value:
+        if value % divisor:
+            divisor += 2
+        else:
+            factors.append(divisor)
+            value //= divisor
+    factors.append(value)
     return factors
 
 
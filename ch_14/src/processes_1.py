@@ -13,19 +13,19 @@ class MuchCPU(Process):
     def run(self) -> None:
         print(f"OS PID {os.getpid()}")
 
-        s = sum(2 * i + 1 for i in range(100_000_000))
+        s = sum(range(1, 200_000_000, 2))
 
 
 class MoreCPU(Thread):
     def run(self) -> None:
         print(f"OS PID {os.getpid()}")
 
-        s = sum(2 * i + 1 for i in range(100_000_000))
+        s = sum(range(1, 200_000_000, 2))
 
 
 if __name__ == "__main__":
-    # workers = [MuchCPU() for f in range(cpu_count())]
-    workers = [MoreCPU() for f in range(cpu_count())]
+    workers = [MuchCPU() for f in range(cpu_count())]
+    # workers = [MoreCPU() for f in range(cpu_count())]
 
     t = time.perf_counter()
     for p in workers:
@@ -5,22 +5,24 @@ Chapter 14.  Concurrency
 """
 from __future__ import annotations
 import abc
-from itertools import permutations
+import json
 import logging
 import logging.handlers
 import os
 import random
+import socket
+import struct
 import time
 import sys
-from typing import Iterable
+from typing import Sequence
 
 logger = logging.getLogger(f"app_{os.getpid()}")
 
 
 class Sorter(abc.ABC):
     def __init__(self) -> None:
-        id = os.getpid()
-        self.logger = logging.getLogger(f"app_{id}.{self.__class__.__name__}")
+        # A child of this process's "app_{pid}" logger, named for the class.
+        self.logger = logger.getChild(self.__class__.__name__)
 
     @abc.abstractmethod
     def sort(self, data: list[float]) -> list[float]:
@@ -29,26 +31,29 @@ class Sorter(abc.ABC):
 
 class BogoSort(Sorter):
     @staticmethod
-    def is_ordered(data: tuple[float, ...]) -> bool:
-        pairs: Iterable[tuple[float, float]] = zip(data, data[1:])
-        return all(a <= b for a, b in pairs)
+    def is_ordered(data: Sequence[float]) -> bool:
+        # Indexing in place: no slice copy, no generator, and an early exit.
+        for index in range(len(data) - 1):
+            if data[index] > data[index + 1]:
+                return False
+        return True
 
     def sort(self, data: list[float]) -> list[float]:
         self.logger.info("Sorting %d", len(data))
         start = time.perf_counter()
 
-        ordering: tuple[float, ...] = tuple(data[:])
-        permute_iter = permutations(data)
+        # Shuffle a copy in place until it happens to be in order.
+        ordering = data[:]
         steps = 0
         while not BogoSort.is_ordered(ordering):
-            ordering = next(permute_iter)
+            random.shuffle(ordering)
             steps += 1
 
         duration = 1000 * (time.perf_counter() - start)
         self.logger.info(
             "Sorted %d items in %d steps, %.3f ms", len(data), steps, duration
         )
-        return list(ordering)
+        return ordering
 
 
 class GnomeSort(Sorter):
@@ -56,9 +61,11 @@ class GnomeSort(Sorter):
         self.logger.info("Sorting %d", len(data))
         start = time.perf_counter()
 
-        index = 1
-        while index != len(data):
-            if data[index - 1] < data[index]:
+        # Equal neighbours are already in order; stepping past them, rather
+        # than swapping, also keeps a run of equal values from looping forever.
+        index, size = 1, len(data)
+        while index < size:
+            if data[index - 1] <= data[index]:
                 index += 1
             else:
                 data[index - 1], data[index] = data[index], data[index - 1]
@@ -70,7 +77,96 @@ class GnomeSort(Sorter):
         return data
 
 
-def main(workload: int = 10, sorter: Sorter = BogoSort()) -> int:
+class BuiltinSort(Sorter):
+    """The built-in Timsort; BogoSort and GnomeSort remain as demonstrations."""
+
+    def sort(self, data: list[float]) -> list[float]:
+        self.logger.info("Sorting %d", len(data))
+        start = time.perf_counter()
+
+        data.sort()
+
+        duration = 1000 * (time.perf_counter() - start)
+        self.logger.info("Sorted %d items, %.3f ms", len(data), duration)
+        return data
+
+
+class NoDelaySocketHandler(logging.handlers.SocketHandler):
+    """
+    A SocketHandler whose TCP socket sends each write immediately.
+
+    Writes are already batched by BatchingSocketHandler, so there's
+    nothing for Nagle's algorithm to coalesce; it would only delay them.
+    """
+
+    def makeSocket(self, timeout: float = 1) -> socket.socket:
+        sock = super().makeSocket(timeout)
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 256 * 1024)
+        return sock
+
+
+class JSONSocketHandler(NoDelaySocketHandler):
+    """
+    Frames each record as length-prefixed JSON instead of a pickle.
+
+    The fields are the ones SocketHandler pickles, so the log catcher can
+    write the JSON as it arrives, with no unpickling or re-encoding.
+    """
+
+    def makePickle(self, record: logging.LogRecord) -> bytes:
+        if record.exc_info:
+            # Formatting fills in record.exc_text with the traceback.
+            self.format(record)
+        d = dict(record.__dict__)
+        d["msg"] = record.getMessage()
+        d["args"] = None
+        d["exc_info"] = None
+        d.pop("message", None)
+        payload = json.dumps(d, default=str).encode("utf-8")
+        return struct.pack(">L", len(payload)) + payload
+
+
+class BatchingSocketHandler(logging.handlers.MemoryHandler):
+    """
+    Buffer records, then send the whole buffer to a SocketHandler as one write.
+
+    A MemoryHandler on its own would hand the buffered records to the
+    SocketHandler one at a time, each its own ``send()``. The SocketHandler's
+    length-prefixed pickles are concatenated instead, so the receiver sees
+    the same frames either way.
+    """
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            target = self.target
+            if isinstance(target, logging.handlers.SocketHandler) and self.buffer:
+                # As in SocketHandler.emit(): hold its lock, and report a failure
+                # with handleError() instead of raising into the logging call.
+                target.acquire()
+                try:
+                    frames = []
+                    for record in self.buffer:
+                        try:
+                            if target.filter(record):
+                                frames.append(target.makePickle(record))
+                        except Exception:
+                            target.handleError(record)
+                    target.send(b"".join(frames))
+                except Exception:
+                    target.handleError(self.buffer[-1])
+                finally:
+                    target.release()
+                self.buffer.clear()
+            else:
+                super().flush()
+        finally:
+            self.release()
+
+
+def main(workload: int = 10, sorter: Sorter = BuiltinSort()) -> int:
     total = 0
     for i in range(workload):
         samples = random.randint(3, 10)
@@ -82,9 +178,12 @@ def main(workload: int = 10, sorter: Sorter = BogoSort()) -> int:
 
 if __name__ == "__main__":
     LOG_HOST, LOG_PORT = "localhost", 18842
-    socket_handler = logging.handlers.SocketHandler(LOG_HOST, LOG_PORT)
+    socket_handler = JSONSocketHandler(LOG_HOST, LOG_PORT)
+    batching_handler = BatchingSocketHandler(
+        capacity=1024, flushLevel=logging.ERROR, target=socket_handler
+    )
     stream_handler = logging.StreamHandler(sys.stderr)
-    logging.basicConfig(handlers=[socket_handler, stream_handler], level=logging.INFO)
+    logging.basicConfig(handlers=[batching_handler, stream_handler], level=logging.INFO)
 
     start = time.perf_counter()
     workload = 10
@@ -5,6 +5,7 @@ Chapter 14.  Concurrency
 """
 import asyncio
 import httpx
+import importlib.util
 import re
 import time
 from urllib.request import urlopen
@@ -49,29 +50,61 @@ ZONES = [
 ]
 
 
+# With HTTP/2, all the requests to the one server share a single connection.
+# httpx needs the optional h2 package for it (``pip install httpx[http2]``).
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
 class MarineWX:
-    advisory_pat = re.compile(r"\n\.\.\.(.*?)\.\.\.\n", re.M | re.S)
+    # Matched against the raw bytes; only the advisory itself is decoded.
+    advisory_pat = re.compile(rb"\n\.\.\.(.*?)\.\.\.\n", re.M | re.S)
 
     def __init__(self, zone: Zone) -> None:
         super().__init__()
         self.zone = zone
-        self.doc = ""
+        self.doc = b""
+        self._advisory = ""
 
-    async def run(self) -> None:
+    async def run(self, client: Optional[httpx.AsyncClient] = None) -> None:
         """
         Blocking IO assigned to a task.
         with urlopen(self.zone.forecast_url) as stream:
             self.doc = stream.read().decode("UTF-8")
+
+        Given a ``client`` shared by all the tasks, its connections to the
+        server are reused rather than each task opening and closing its own.
+        """
+        if client is None:
+            async with httpx.AsyncClient() as client:
+                await self.fetch(client)
+        else:
+            await self.fetch(client)
+
+    async def fetch(self, client: httpx.AsyncClient) -> None:
+        """
+        Stream the forecast, and stop reading once the advisory is found.
+        ``doc`` holds the forecast up to the advisory, or all of it if
+        there isn't one.
+
+        The advisory is extracted here, while other tasks are still waiting
+        on the network, rather than after all of them are done.
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.get(self.zone.forecast_url)
-        self.doc = response.text
+        buffer = bytearray()
+        match = None
+        async with client.stream("GET", self.zone.forecast_url) as response:
+            async for chunk in response.aiter_bytes():
+                buffer += chunk
+                if match := self.advisory_pat.search(buffer):
+                    break
+        self.doc = bytes(buffer)
+        self._advisory = ""
+        if match:
+            text = match.group(1).decode("utf-8", "replace")
+            self._advisory = text.replace("\n", " ")
 
     @property
     def advisory(self) -> str:
-        if match := self.advisory_pat.search(self.doc):
-            return match.group(1).replace("\n", " ")
-        return ""
+        return self._advisory
 
     def __repr__(self) -> str:
         return f"{self.zone.zone_name} {self.advisory}"
@@ -81,7 +114,8 @@ async def task_main() -> None:
     start = time.perf_counter()
     forecasts = [MarineWX(z) for z in ZONES]
 
-    await asyncio.gather(*(asyncio.create_task(f.run()) for f in forecasts))
+    async with httpx.AsyncClient(http2=HTTP2) as client:
+        await asyncio.gather(*(f.run(client) for f in forecasts))
 
     for f in forecasts:
         print(f)
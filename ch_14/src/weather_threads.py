@@ -51,17 +51,22 @@ class TempGetter(Thread):
     def run(self) -> None:
         with urlopen(self.station.url) as stream:
             try:
-                # xml = ElementTree.parse(stream)
-                doc = stream.read()
-                xml = ElementTree.fromstring(doc)
-                temperature_tag = xml.find("currentConditions/temperature")
-                if temperature_tag is not None:
-                    self.temperature = temperature_tag.text
+                # The current conditions come near the start of the document;
+                # parse only that far, rather than reading and building it all.
+                path: list[str] = []
+                for event, element in ElementTree.iterparse(stream, ("start", "end")):
+                    if event == "start":
+                        path.append(element.tag)
+                        continue
+                    if path[1:] == ["currentConditions", "temperature"]:
+                        self.temperature = element.text
+                        break
+                    path.pop()
                 else:
                     self.temperature = "(missing)"
             except ElementTree.ParseError as ex:
                 print(ex)
-                print(doc)
+                print(self.station.url)
                 raise
 
 
@@ -52,13 +52,26 @@ def test_typing(mock_code_2):
     assert actual == code_search.ImportResult(mock_code_2, {"math", "typing"})
 
 @fixture
-def mock_futures_pool(tmp_path, monkeypatch):
-    future = Mock(
-        result=Mock(
-            return_value=code_search.ImportResult(tmp_path/"code.py", {"typing"}))
+def mock_code_3(tmp_path):
+    source = tmp_path / "code_3.py"
+    source.write_text(
+        '"""\nimport docstring\n"""\n'
+        "from . import sibling\n"
+        "if True: import typing\n"
     )
+    return source
+
+def test_ast_fallback(mock_code_3):
+    assert code_search.scan_imports(mock_code_3.read_bytes()) is None
+    actual = code_search.find_imports(mock_code_3)
+    assert actual == code_search.ImportResult(mock_code_3, {"typing"})
+
+@fixture
+def mock_futures_pool(tmp_path, monkeypatch):
     context = MagicMock(
-        submit=Mock(return_value=future)
+        map=Mock(
+            return_value=[code_search.ImportResult(tmp_path/"code.py", {"typing"})]
+        )
     )
     pool = MagicMock(
         __enter__=Mock(return_value=context)
@@ -66,11 +79,7 @@ def mock_futures_pool(tmp_path, monkeypatch):
     pool_class = Mock(
         return_value=pool
     )
-    monkeypatch.setattr(code_search.futures, 'ThreadPoolExecutor', pool_class)
-    as_completed = Mock(
-        side_effect=lambda futures: futures
-    )
-    monkeypatch.setattr(code_search.futures, 'as_completed', as_completed)
+    monkeypatch.setattr(code_search.futures, 'ProcessPoolExecutor', pool_class)
     return pool_class
 
 @fixture
@@ -91,13 +100,11 @@ def mock_time(monkeypatch):
 def test_main(mock_all_source, mock_futures_pool, mock_time, tmp_path, capsys, monkeypatch):
     monkeypatch.chdir(tmp_path)
     code_search.main(tmp_path)
-    assert mock_futures_pool.mock_calls == [call(24)]
+    assert mock_futures_pool.mock_calls == [call()]
     context = mock_futures_pool.return_value.__enter__.return_value
-    assert context.submit.mock_calls == [
-        call(code_search.find_imports, tmp_path/"file1.py")
+    assert context.map.mock_calls == [
+        call(code_search.find_imports, mock_all_source, chunksize=32)
     ]
-    future = context.submit.return_value
-    assert future.result.mock_calls == [call()]
     out, err = capsys.readouterr()
     target_path = "code.py"
     assert out.splitlines() == [
@@ -3,22 +3,11 @@ Python 3 Object-Oriented Programming
 
 Chapter 14.  Concurrency
 """
+from multiprocessing import shared_memory
 from pytest import *
 from unittest.mock import Mock, sentinel, call
 import directory_search
 
-@fixture
-def mock_query_queue():
-    return Mock(
-        get=Mock(side_effect=["xyzzy", None])
-    )
-
-@fixture
-def mock_result_queue():
-    return Mock(
-        put=Mock()
-    )
-
 @fixture
 def mock_paths(tmp_path):
     f1 = tmp_path / "file1"
@@ -28,12 +17,30 @@ def mock_paths(tmp_path):
     return [f1, f2]
 
 
-def test_search(mock_paths, mock_query_queue, mock_result_queue):
-    directory_search.search(mock_paths, mock_query_queue, mock_result_queue)
-    assert mock_query_queue.get.mock_calls == [call(), call()]
-    assert mock_result_queue.put.mock_calls == [
-        call(['file2 contains xyzzy'])
-    ]
+@fixture
+def mock_shared_text():
+    text = b"not in file1\nfile2 contains xyzzy\n"
+    shared_text = shared_memory.SharedMemory(create=True, size=len(text))
+    shared_text.buf[:len(text)] = text
+    yield shared_text.name, len(text)
+    shared_text.close()
+    shared_text.unlink()
+
+
+@fixture
+def attached_worker(mock_shared_text):
+    name, size = mock_shared_text
+    directory_search.attach(name, size)
+    yield size
+    directory_search.text.release()
+    directory_search.shared_text.close()
+
+
+def test_search(attached_worker):
+    size = attached_worker
+    assert directory_search.search("xyzzy", 0, size) == ['file2 contains xyzzy']
+    assert directory_search.search("file", 0, 13) == ['not in file1']
+    assert directory_search.search("absent", 0, size) == []
 
 
 @fixture
@@ -54,58 +61,39 @@ def test_all_source(mock_directory):
 
 
 @fixture
-def mock_queue(monkeypatch):
+def mock_pool(monkeypatch):
     mock_instance = Mock(
-        name="mock Queue",
-        put=Mock(),
-        get=Mock(return_value=["line with text"])
+        name="mock ProcessPoolExecutor",
+        map=Mock(return_value=[["line with text"], ["line with text"]]),
+        shutdown=Mock()
     )
-    mock_queue_class = Mock(
+    mock_pool_class = Mock(
         return_value=mock_instance
     )
-    monkeypatch.setattr(directory_search, "Queue", mock_queue_class)
-    return mock_queue_class
-
-
-@fixture
-def mock_process(monkeypatch):
-    mock_instance = Mock(
-        name="mock Process",
-        start=Mock(),
-        join=Mock()
-    )
-    mock_process_class = Mock(
-        return_value=mock_instance
+    monkeypatch.setattr(
+        directory_search.futures, "ProcessPoolExecutor", mock_pool_class
     )
-    monkeypatch.setattr(directory_search, "Process", mock_process_class)
-    return mock_process_class
+    return mock_pool_class
 
-def test_directory_search(mock_queue, mock_process, mock_paths):
+def test_directory_search(mock_pool, mock_paths):
     ds_instance = directory_search.DirectorySearch()
     ds_instance.setup_search(mock_paths, cpus=2)
 
-    assert mock_queue.mock_calls == [call(), call(), call()]
-    assert mock_process.mock_calls == [
-        call(
-            target=directory_search.search,
-            args=(mock_paths[0::2], mock_queue.return_value, mock_queue.return_value)
-        ),
-        call(
-            target=directory_search.search,
-            args=(mock_paths[1::2], mock_queue.return_value, mock_queue.return_value)
-        )
+    name = ds_instance.shared_text.name
+    assert bytes(ds_instance.shared_text.buf[:34]) == (
+        b"not in file1\nfile2 contains xyzzy\n"
+    )
+    assert mock_pool.mock_calls == [
+        call(max_workers=2, initializer=directory_search.attach, initargs=(name, 34))
     ]
-    assert mock_process.return_value.start.mock_calls == [call(), call()]
-    assert ds_instance.query_queues == [mock_queue.return_value, mock_queue.return_value]
-    assert ds_instance.results_queue == mock_queue.return_value
-    assert ds_instance.search_workers == [mock_process.return_value, mock_process.return_value ]
+    assert ds_instance.chunks == [(0, 34), (34, 34)]
 
     result = list(ds_instance.search("text"))
 
     assert result == ['line with text', 'line with text']
-    assert mock_queue.return_value.put.mock_calls == [call("text"), call("text")]
-    assert mock_queue.return_value.get.mock_calls == [call(), call()]
+    assert mock_pool.return_value.map.mock_calls == [
+        call(directory_search.search, ["text", "text"], [0, 34], [34, 34])
+    ]
 
     ds_instance.teardown_search()
-    assert mock_queue.return_value.put.mock_calls == [call("text"), call("text"), call(None), call(None)]
-    assert mock_process.return_value.join.mock_calls == [call(), call()]
+    assert mock_pool.return_value.shutdown.mock_calls == [call()]
@@ -4,12 +4,16 @@ Python 3 Object-Oriented Programming
 Chapter 13.  Testing Object-Oriented Programs.
 """
 from __future__ import annotations
+import csv
+import io
 import pytest
 from fw_model import TrainingKnownSample, UnknownSample, KnownSample, Sample, USample
-from fw_model import CD, ED, MD, SD
+from fw_model import CD, ED, MD, SD, Distance
 from fw_model import SharedSamplesCSV
+import fw_model
 from typing import Tuple, TypedDict, TextIO
 from multiprocessing.managers import SharedMemoryManager
+import numpy as np
 
 
 Known_Unknown = Tuple[TrainingKnownSample, UnknownSample]
@@ -39,8 +43,7 @@ def known_unknown_example_15() -> Known_Unknown:
         "petal_width": 1.4,
     }
     with SharedMemoryManager() as smm:
-        shareable_data = SharedSamplesCSV.load(smm, [known_row])
-        factory = SharedSamplesCSV(shareable_data)
+        factory = SharedSamplesCSV.load(smm, [known_row])
         tks = TrainingKnownSample(KnownSample(factory, 0))
         us = UnknownSample(
             sample=USample(
@@ -73,6 +76,61 @@ def test_sd(known_unknown_example_15: Known_Unknown) -> None:
     assert SD().distance(k.sample.sample, u.sample) == pytest.approx(0.2773722627)
 
 
+@pytest.mark.parametrize("algorithm", [CD(), ED(), MD(), SD()])
+def test_distance_batch(
+    known_unknown_example_15: Known_Unknown, algorithm: Distance
+) -> None:
+    k, u = known_unknown_example_15
+    training = np.array([k.sample.sample.astuple(), u.sample])
+    expected = [algorithm.distance(k.sample.sample, u.sample), 0.0]
+    actual = algorithm.distance_batch(training, np.array(u.sample))
+    assert list(actual) == pytest.approx(expected)
+
+
+def test_load_rows() -> None:
+    text = "5.1,3.5,1.4,0.2,Iris-setosa\n7.9,3.2,4.7,1.4,Iris-versicolor\n\n"
+    with SharedMemoryManager() as smm:
+        factory = SharedSamplesCSV.load_rows(smm, csv.reader(io.StringIO(text)))
+        assert len(factory) == 2
+        assert factory.row(1) == {
+            "sepal_length": 7.9,
+            "sepal_width": 3.2,
+            "petal_length": 4.7,
+            "petal_width": 1.4,
+            "species": "Iris-versicolor",
+        }
+
+
+def test_training_data_test() -> None:
+    rows = [
+        {
+            "sepal_length": 4.5 + (i % 7) / 2,
+            "sepal_width": 2.0 + (i % 5) / 2,
+            "petal_length": 1.0 + (i % 11) / 2,
+            "petal_width": 0.5 + (i % 3) / 2,
+            "species": f"Iris-{i % 3}",
+        }
+        for i in range(40)
+    ]
+    with SharedMemoryManager() as smm:
+        factory = SharedSamplesCSV.load(smm, rows)
+        td = fw_model.TrainingData("test")
+        td.load(factory)
+        algorithms = [CD(), ED(), MD(), SD(), fw_model.CD2()]
+        expected = [
+            fw_model.Hyperparameter(k, algorithm, td).test().quality
+            for k in (1, 3, 5, 41)
+            for algorithm in algorithms
+        ]
+        parameters = [
+            fw_model.Hyperparameter(k, algorithm, td)
+            for k in (1, 3, 5, 41)
+            for algorithm in algorithms
+        ]
+        td.test(parameters)
+        assert [h.quality for h in parameters] == expected
+
+
 from model import Hyperparameter
 from unittest.mock import Mock, sentinel, call
 
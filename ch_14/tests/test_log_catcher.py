@@ -20,8 +20,14 @@ def test_log_writer(mock_target, capsys):
     payload = pickle.dumps("message")
     asyncio.run(log_catcher.log_writer(payload))
     assert mock_target.write.mock_calls == [
-        call('"message"'),
-        call('\n')
+        call('"message"\n')
+    ]
+
+def test_log_writer_json(mock_target, capsys):
+    payload = b'{"msg": "message"}'
+    asyncio.run(log_catcher.log_writer(payload))
+    assert mock_target.write.mock_calls == [
+        call('{"msg": "message"}\n')
     ]
 
 
@@ -39,7 +45,9 @@ def mock_stream():
     payload = pickle.dumps("message")
     size = struct.pack(">L", len(payload))
     stream = Mock(
-        read=AsyncMock(side_effect=[size, payload, None]),
+        readexactly=AsyncMock(
+            side_effect=[size, payload, asyncio.IncompleteReadError(b"", 4)]
+        ),
         get_extra_info=Mock(return_value=mock_socket)
     )
     return payload, stream
@@ -49,5 +57,5 @@ def test_log_catcher(mock_log_writer, mock_stream):
     payload, stream = mock_stream
     asyncio.run(log_catcher.log_catcher(stream, stream))
     # Depends on len(payload)
-    assert stream.read.mock_calls == [call(4), call(22), call(4)]
+    assert stream.readexactly.mock_calls == [call(4), call(22), call(4)]
     mock_log_writer.assert_awaited_with(payload)
@@ -111,3 +111,27 @@ def test_hyperparameter(sample_data: list[Mock], hyperparameter: Mock) -> None:
         call(sample_data[3].sample.sample, sentinel.Unknown),
         call(sample_data[4].sample.sample, sentinel.Unknown),
     ]
+
+
+from pathlib import Path
+from model import CSVIrisReader, TrainingData
+
+
+def test_load_arrays(tmp_path: Path) -> None:
+    source = tmp_path / "iris.data"
+    source.write_text(
+        "5.1,3.5,1.4,0.2,Iris-setosa\n"
+        "7.9,3.2,4.7,1.4,Iris-versicolor\n"
+        "6.3,3.3,6.0,2.5,Iris-virginica\n"
+        "\n"
+    )
+    reader = CSVIrisReader(source)
+    from_dicts = TrainingData("dicts")
+    from_dicts.load(reader.data_iter())
+    from_arrays = TrainingData("arrays")
+    from_arrays.load_arrays(*reader.data_arrays())
+    assert from_arrays.training == from_dicts.training
+    assert [t.sample for t in from_arrays.testing] == [t.sample for t in from_dicts.testing]
+    assert from_arrays.train_X.tolist() == from_dicts.train_X.tolist()
+    assert from_arrays.test_X.tolist() == from_dicts.test_X.tolist()
+    assert from_arrays.train_species == ["Iris-versicolor", "Iris-virginica"]
@@ -25,8 +25,7 @@ def mock_sleep(monkeypatch):
 def test_philosopher(mock_sleep, mock_random, capsys):
     async def when():
         philosophers.FORKS = [asyncio.Lock() for i in range(2)]
-        footman = asyncio.BoundedSemaphore(1)
-        return await philosophers.philosopher(0, footman)
+        return await philosophers.philosopher(0)
 
     result_0 = asyncio.run(when())
     assert result_0 == (0, 1.2, 1.3)
@@ -48,23 +47,14 @@ def mock_philosopher(monkeypatch):
     monkeypatch.setattr(philosophers, 'philosopher', philosopher)
     return philosopher
 
-@fixture
-def mock_bounded_semaphore(monkeypatch):
-    mock_class = Mock(
-        return_value=sentinel.mock_bounded_semaphore
-    )
-    monkeypatch.setattr(asyncio, 'BoundedSemaphore', mock_class)
-    return mock_class
-
-def test_main(mock_philosopher, mock_bounded_semaphore):
+def test_main(mock_philosopher):
     asyncio.run(philosophers.main(5, 1))
     mock_philosopher.assert_has_awaits(
         [
-            call(0, sentinel.mock_bounded_semaphore),
-            call(1, sentinel.mock_bounded_semaphore),
-            call(2, sentinel.mock_bounded_semaphore),
-            call(3, sentinel.mock_bounded_semaphore),
-            call(4, sentinel.mock_bounded_semaphore),
+            call(0),
+            call(1),
+            call(2),
+            call(3),
+            call(4),
         ]
     )
-    mock_bounded_semaphore.assert_called_once_with(4)
@@ -6,7 +6,7 @@ Chapter 14.  Concurrency
 import asyncio
 from httpx import URL
 from pytest import *
-from unittest.mock import Mock, AsyncMock, mock_open, call
+from unittest.mock import Mock, AsyncMock, MagicMock, mock_open, call
 import weather_async
 
 def test_zone():
@@ -45,3 +45,21 @@ def test_marine_wx(marine_wx, mock_httpx_client, httpx_mock):
     assert (
         httpx_mock.get_request().url == URL('https://tgftp.nws.noaa.gov/data/forecasts/marine/coastal/an/anz540.txt')
     )
+
+def test_marine_wx_shared_client(marine_wx):
+    async def chunks():
+        yield b"Heading\n...Advisory...\n"
+        yield b".DAY...details.\n"
+    response = Mock(aiter_bytes=Mock(return_value=chunks()))
+    stream = MagicMock()
+    stream.__aenter__.return_value = response
+    client = Mock(stream=Mock(return_value=stream))
+    async def when():
+        return await marine_wx.run(client)
+    result_0 = asyncio.run(when())
+    assert marine_wx.advisory == "Advisory"
+    # Reading stopped once the advisory was found.
+    assert marine_wx.doc == b"Heading\n...Advisory...\n"
+    client.stream.assert_called_once_with(
+        "GET", 'https://tgftp.nws.noaa.gov/data/forecasts/marine/coastal/an/anz540.txt'
+    )
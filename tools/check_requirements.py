@@ -4,74 +4,212 @@ Check requirements.txt in each chapter
 
 import ast
 import collections
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor
+import hashlib
+import json
+import os
 from pathlib import Path
 import re
+import shutil
 import site
+import sys
 from textwrap import dedent
-from typing import List, Tuple, Set, Iterator, Iterable, Dict, Sequence, cast, Union
+from typing import (
+    List,
+    Tuple,
+    Set,
+    Iterator,
+    Iterable,
+    Dict,
+    FrozenSet,
+    Sequence,
+    cast,
+    Union,
+    Optional,
+)
+
+
+def module_imports(tree: ast.Module) -> Set[str]:
+    """
+    Imports at module level, including those nested in if/try/with blocks.
+    Function and class bodies are not searched.
+    """
+    imports: Set[str] = set()
+    stack: List[ast.stmt] = list(tree.body)
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is ast.Import:
+            imports.update(alias.name for alias in cast(ast.Import, node).names)
+        elif node_type is ast.ImportFrom:
+            module = cast(ast.ImportFrom, node).module
+            if module:
+                imports.add(module)
+        elif node_type is ast.If:
+            stack.extend(cast(ast.If, node).body)
+            stack.extend(cast(ast.If, node).orelse)
+        elif node_type is ast.With:
+            stack.extend(cast(ast.With, node).body)
+        elif node_type is ast.Try:
+            try_node = cast(ast.Try, node)
+            stack.extend(try_node.body)
+            for handler in try_node.handlers:
+                stack.extend(handler.body)
+            stack.extend(try_node.orelse)
+            stack.extend(try_node.finalbody)
+    return imports
+
+
+CACHE_PATH = Path.home() / ".cache" / "check_requirements" / "imports.json"
+
+# Bump this whenever the way imports are extracted changes,
+# so results saved by an older version are discarded.
+CACHE_VERSION = 3
 
+# SHA-256 of a module's source -> the sorted names it imports.
+import_cache: Dict[str, List[str]] = {}
 
-class ImportVisitor(ast.NodeVisitor):
-    def __init__(self) -> None:
-        self.imports: Set[str] = set()
 
-    def visit_Import(self, node: ast.Import) -> None:
-        # print(ast.dump(node))
-        for alias in node.names:
-            self.imports.add(alias.name)
+def load_cache(path: Path = CACHE_PATH) -> None:
+    if path.exists():
+        saved = json.loads(path.read_text())
+        if saved.get("version") == CACHE_VERSION:
+            import_cache.update(saved["imports"])
 
-    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
-        # print(ast.dump(node))
-        if node.module:
-            self.imports.add(node.module)
+
+def save_cache(path: Path = CACHE_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"version": CACHE_VERSION, "imports": import_cache}))
+
+
+IMPORT_LINE = re.compile(rb"^[ \t]*(?:import|from)\b", re.M)
+IMPORT_KEYWORD = re.compile(rb"\bimport\b")
+SIMPLE_IMPORT = re.compile(
+    rb"^(?:from[ \t]+\.*([\w.]*)[ \t]*import[ \t]"
+    rb"|import[ \t]+([\w.]+(?:[ \t]+as[ \t]+\w+)?"
+    rb"(?:[ \t]*,[ \t]*[\w.]+(?:[ \t]+as[ \t]+\w+)?)*)[ \t]*(?:#.*)?$)",
+    re.M,
+)
+
+
+def scan_imports(source: bytes) -> Optional[Set[str]]:
+    """
+    Extract import names with a regex when every import is a simple,
+    top-level statement. Returns None if anything needs the real parser:
+    indented imports, continuation lines, or stray lines starting "from".
+    Also None for ``;`` or ``\\`` on an import line, or any other "import"
+    keyword, since either could hide a statement the regex never sees.
+    And None if a triple quote comes before any import-looking line:
+    that line could be text in a docstring, not an import.
+    """
+    import_lines = [m.start() for m in IMPORT_LINE.finditer(source)]
+    matches = list(SIMPLE_IMPORT.finditer(source))
+    if len(matches) != len(import_lines):
+        return None
+    if len(IMPORT_KEYWORD.findall(source)) != len(matches):
+        return None
+    for match in matches:
+        end = source.find(b"\n", match.start())
+        line = source[match.start() : None if end < 0 else end].rstrip()
+        if b";" in line or line.endswith(b"\\"):
+            return None
+    if import_lines:
+        quotes = [q for q in (source.find(b'"""'), source.find(b"'''")) if q >= 0]
+        if quotes and min(quotes) < import_lines[-1]:
+            return None
+    imports: Set[str] = set()
+    for match in matches:
+        module, modules = match.groups()
+        if modules is None:
+            if module:
+                imports.add(module.decode())
+        else:
+            imports.update(name.split()[0].decode() for name in modules.split(b","))
+    return imports
 
 
-def find_imports(path: Path) -> Set[str]:
-    tree = ast.parse(path.read_text())
-    iv = ImportVisitor()
-    iv.visit(tree)
-    return iv.imports
+def source_imports(source: bytes, filename: str = "<unknown>") -> Set[str]:
+    imports = scan_imports(source)
+    if imports is None:
+        tree = ast.parse(source, filename=filename, feature_version=(3, 9))
+        imports = module_imports(tree)
+    return imports
 
 
 def all_source(path: Path) -> Iterator[Path]:
-    for code_path in path.glob("**/*.py"):
-        if any(n.startswith(".") for n in code_path.parts):
-            continue
-        if any(n.startswith("__") and n.endswith("__") for n in code_path.parts):
-            continue
-        yield code_path
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith(".") or (name.startswith("__") and name.endswith("__")):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from all_source(Path(entry.path))
+            elif name.endswith(".py") and entry.is_file():
+                yield Path(entry.path)
 
 
-def all_imports(all_source: Iterable[Path]) -> Iterator[Set[str]]:
+def all_imports(
+    all_source: Iterable[Path], executor: Optional[Executor] = None
+) -> Iterator[Set[str]]:
+    """
+    Cached results are yielded first. The modules missing from the cache are
+    parsed, in the executor's workers if one is given, and yielded as they arrive.
+    Identical sources are parsed and yielded only once.
+    """
+    misses: Dict[str, Tuple[bytes, str]] = {}
     for code_path in all_source:
-        import_names = find_imports(code_path)
-        yield import_names
+        source = code_path.read_bytes()
+        key = hashlib.sha256(source).hexdigest()
+        if key in import_cache:
+            yield set(import_cache[key])
+        else:
+            misses[key] = (source, str(code_path))
+    sources = [source for source, _ in misses.values()]
+    filenames = [filename for _, filename in misses.values()]
+    if executor:
+        parsed = executor.map(source_imports, sources, filenames, chunksize=16)
+    else:
+        parsed = map(source_imports, sources, filenames)
+    for key, imports in zip(misses, parsed):
+        import_cache[key] = sorted(imports)
+        yield imports
+
+
+REQ_PAT = re.compile(r"(.+?)([\>\<~=]+)(.*)")
 
 
 def find_requirements(path: Path) -> Iterator[Sequence[str]]:
-    req_pat = re.compile(r"(.+?)([\>\<~=]+)(.*)")
     if not path.exists():
-        return []
-    lines = filter(None, (line.rstrip() for line in path.read_text().splitlines()))
-    matches = [(req_pat.match(line), line) for line in lines]
-    failures = [txt for m, txt in matches if m is None]
+        return
+    requirements: List[Sequence[str]] = []
+    failures: List[str] = []
+    for raw_line in path.read_bytes().splitlines():
+        if not (line := raw_line.rstrip().decode()):
+            continue
+        if m := REQ_PAT.fullmatch(line):
+            requirements.append(m.groups())
+        else:
+            failures.append(line)
     assert len(failures) == 0, f"Unparseable {failures}"
-    yield from (m.groups() for m, txt in matches if m)
+    yield from requirements
 
 
 def defined(*locations: Path) -> Iterator[str]:
     for site_packages_path in locations:
-        for path in Path(site_packages_path).glob("*"):
-            if any(n.startswith("__") and n.endswith("__") for n in path.parts):
-                continue
-            yield path.stem
-        for path in Path(site_packages_path).glob("*.py"):
-            yield path.stem
+        if not site_packages_path.is_dir():
+            continue
+        with os.scandir(site_packages_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith("__") and name.endswith("__"):
+                    continue
+                yield os.path.splitext(name)[0]
 
 
-def scan(base: Path = Path.cwd()) -> None:
-    std_locations = [Path(p).parent for p in site.getsitepackages()]
-    standard_library = set(defined(*std_locations)) | {
+@functools.cache
+def standard_library(std_locations: Tuple[Path, ...]) -> FrozenSet[str]:
+    return frozenset(defined(*std_locations)) | {
         "collections.abc",
         "math",
         "sys",
@@ -81,28 +219,44 @@ def scan(base: Path = Path.cwd()) -> None:
         "urllib.request",
         "unittest.mock",
     }
+
+
+def chapters(base: Path) -> List[Path]:
+    with os.scandir(base) as entries:
+        return [
+            Path(entry.path)
+            for entry in entries
+            if entry.name.startswith("ch_") and entry.is_dir(follow_symlinks=False)
+        ]
+
+
+def scan(base: Path = Path.cwd()) -> None:
+    load_cache()
+    std_locations = tuple(Path(p).parent for p in site.getsitepackages())
+    std_names = standard_library(std_locations)
     master_requirements: Dict[str, Set[Tuple[str, str, str]]] = collections.defaultdict(
         set
     )
-    for chapter in base.glob("ch_*"):
-        requirements = list(find_requirements(chapter / "requirements.txt"))
-        for n, op, v in requirements:
-            master_requirements[n].add((n, op, v))
-        req_names = set(n for n, op, v in requirements)
-        import_names = cast(Set[str], set()).union(*all_imports(all_source(chapter)))
-        defined_names = set(defined(chapter / "src"))
-        non_standard = import_names - standard_library - defined_names
-        if non_standard:
-            print(chapter.stem, "needs", non_standard)
-    print("\nrequirements.txt")
+    report: List[str] = []
+    with ProcessPoolExecutor() as executor:
+        for chapter in chapters(base):
+            requirements = list(find_requirements(chapter / "requirements.txt"))
+            for n, op, v in requirements:
+                master_requirements[n].add((n, op, v))
+            req_names = set(n for n, op, v in requirements)
+            import_names: Set[str] = set()
+            for names in all_imports(all_source(chapter), executor):
+                import_names.update(names)
+            defined_names = set(defined(chapter / "src"))
+            non_standard = import_names - std_names - defined_names
+            if non_standard:
+                report.append(f"{chapter.stem} needs {non_standard}")
+    save_cache()
+    report.extend(["", "requirements.txt"])
     for references in master_requirements.values():
-        exemplar, *others = list(references)
-        print(f"{''.join(exemplar)}", end="")
-        if others:
-            print(" #", end="")
-        for other in others:
-            print(f" {''.join(other)}", end="")
-        print()
+        exemplar, *others = ("".join(r) for r in references)
+        report.append(" ".join([exemplar, "#", *others] if others else [exemplar]))
+    sys.stdout.write("\n".join(report) + "\n")
 
 
 master_requirements = dedent(
@@ -116,13 +270,10 @@ master_requirements = dedent(
 
 
 def blast(base: Path = Path.cwd()) -> None:
-    for chapter in base.glob("ch_*"):
+    for chapter in chapters(base):
         existing = chapter / "requirements.txt"
         if existing.exists():
-            backup = existing.with_stem(f"(old) {existing.stem}")
-            if backup.exists():
-                backup.unlink()
-            backup.write_text(existing.read_text())
+            shutil.copyfile(existing, chapter / f"(old) {existing.name}")
             existing.write_text(master_requirements)
             print(f"Replaced {existing.relative_to(base)}")
     print("Fix Chapter 8 examples!")
@@ -9,13 +9,12 @@ To create HTML from draft case study sections...
 
 """
 from contextlib import redirect_stdout
-from io import StringIO
-import mistune
 import toml
 import configparser
+import os
 import re
 from pathlib import Path
-from typing import TextIO, Iterable, List, NamedTuple, Optional
+from typing import TextIO, Iterable, List, NamedTuple, Optional, Dict, Type, Any
 
 
 class Diagram(NamedTuple):
@@ -40,9 +39,33 @@ class Diagram(NamedTuple):
             return line
 
 
-class FindDiagrams(mistune.Renderer):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+block_pat = re.compile(
+    r"^ *(?P<fence>`{3,}|~{3,}) *(?P<lang>[^\s`]+)?[^\n]*\n"
+    r"(?P<code>[\s\S]*?)^ *(?P=fence) *$"
+    r"|^ *(?P<level>#{1,6}) +(?P<heading>[^\n]+?)(?: +#+)? *$",
+    re.M,
+)
+
+
+def render(text: str, renderer: Any) -> str:
+    """
+    Feed the headings and fenced code blocks of a markdown document,
+    in order, to the renderer's ``header()`` and ``block_code()``.
+    Everything else is skipped; these are the only parts we need.
+    A ``#`` line inside a fence is code, not a heading.
+    """
+    output = []
+    for block in block_pat.finditer(text):
+        if block.group("fence"):
+            output.append(renderer.block_code(block.group("code"), block.group("lang")))
+        else:
+            level = len(block.group("level"))
+            output.append(renderer.header(block.group("heading"), level))
+    return "".join(filter(None, output))
+
+
+class FindDiagrams:
+    def __init__(self):
         self.diagrams = []
         self.recent_heading = None
     def block_code(self, code, lang):
@@ -50,7 +73,7 @@ class FindDiagrams(mistune.Renderer):
             n = len(self.diagrams)
             fenced = (
                 ["@startuml", f"'figure {n}: {self.recent_heading}'"]
-                + code.splitlines()
+                + code.rstrip().splitlines()
                 + ["@enduml"]
             )
             self.diagrams.append(Diagram(n, fenced))
@@ -64,10 +87,9 @@ def defence_diagrams():
     source_path = working / "case_study_10.md"
 
     renderer = FindDiagrams()
-    markdown = mistune.Markdown(renderer=renderer)
 
     text = source_path.read_text()
-    markdown(text)
+    render(text, renderer)
     print(renderer.diagrams)
     for diagram in renderer.diagrams:
         target = working / diagram.file_name
@@ -75,9 +97,8 @@ def defence_diagrams():
         target.write_text(diagram.text)
 
 
-class ExtractPython(mistune.Renderer):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+class ExtractPython:
+    def __init__(self):
         self.count = 0
 
     def block_code(self, code, lang):
@@ -85,39 +106,16 @@ class ExtractPython(mistune.Renderer):
             return ""
         if ">>>" in code:
             self.count += 1
-            return f"\n```{lang if lang else ''}\n{code}\n```\n"
-        return ""
-
-    def block_quote(self, text):
-        return ""
-
-    def block_html(self, html):
+            # The code is verbatim, up to the fence. A blank line must end the
+            # last example's expected output, or doctest reads the fence as output.
+            if not code.endswith("\n\n"):
+                code = code.rstrip("\n") + "\n\n"
+            return f"\n```{lang if lang else ''}\n{code}```\n"
         return ""
 
     def header(self, text, level, raw=None):
         return f'\n{level*"#"} {text}\n'
 
-    def hrule(self):
-        return ""
-
-    def list(self, body, ordered=True):
-        return ""
-
-    def list_item(self, text):
-        return ""
-
-    def paragraph(self, text):
-        return ""
-
-    def table(self, header, body):
-        return ""
-
-    def table_row(self, content):
-        return ""
-
-    def table_cell(self, content, **flags):
-        return ""
-
 def make_example_doc(target_path: Path, examples: str) -> None:
     """Add (or replace) a new target"""
     print(target_path)
@@ -129,78 +127,91 @@ def make_example_doc(target_path: Path, examples: str) -> None:
 def update_pyproject_toml(toml_path: Path) -> None:
     """Update the pyproject.toml tool.tox section
     1. Read the toml wrapper
-    2. Parse the tox.ini inside the toml
-    3. Get the list of *.py and *.md doctest files
-    4. Rewrite the tox.ini's [testenv] or referenced [base] section
-    5. Save the revised tox.ini into the toml
-    6. Save the revised toml wrapper
+    2. Get the list of *.py and *.md doctest files
+    3. Rewrite the tox.ini's [testenv] or referenced [base] section
+    4. Save the revised tox.ini into the toml
+    5. Save the revised toml wrapper
     """
-    # 1. Load the toml wrapper
-    parsed_toml = toml.load(toml_path)
-
-    # 2. Parse the config inside
-    config = configparser.ConfigParser()
-    config.read_string(parsed_toml["tool"]["tox"]["legacy_tox_ini"])
+    # 1. Load the toml wrapper, locating the tox.ini string in the text
+    toml_text = toml_path.read_text()
+    tox_ini = tox_ini_pat.search(toml_text)
+    parsed_toml = None
+    if tox_ini and "\\" not in tox_ini.group(2):
+        legacy_tox_ini = tox_ini.group(2)
+    else:
+        # Not a plain triple-quoted string: parse the whole thing.
+        parsed_toml = toml.loads(toml_text)
+        legacy_tox_ini = parsed_toml["tool"]["tox"]["legacy_tox_ini"]
 
-    # 3. Get the list of *.py and *.md doctest files
+    # 2. Get the list of *.py and *.md doctest files
     abs_test_paths = (
-        list((toml_path.parent/"src").glob("*.py"))
-        + list((toml_path.parent/"docs").glob("*.md"))
+        sorted((toml_path.parent/"src").glob("*.py"))
+        + sorted((toml_path.parent/"docs").glob("*.md"))
     )
     rel_test_paths = [f.relative_to(toml_path.parent) for f in abs_test_paths]
 
-    # 4. Rwrite the [testenv] or referenced [base] section
-    rewrite_section(config, rel_test_paths)
+    # 3. Rewrite the [testenv] or referenced [base] section
+    new_tox_ini = rewrite_tox_ini(legacy_tox_ini, rel_test_paths)
 
-    # 5. Save the revised tox.ini into the toml
-    with StringIO() as temp_file:
-        config.write(temp_file)
-        parsed_toml["tool"]["tox"]["legacy_tox_ini"] = temp_file.getvalue()
+    # 4. Save the revised tox.ini into the toml
+    if parsed_toml is None:
+        escaped = new_tox_ini.replace("\\", "\\\\").replace('"""', '""\\"')
+        new_toml_text = (
+            toml_text[:tox_ini.start(2)] + escaped + toml_text[tox_ini.end(2):]
+        )
+    else:
+        parsed_toml["tool"]["tox"]["legacy_tox_ini"] = new_tox_ini
+        new_toml_text = toml.dumps(parsed_toml)
 
-    # 6. Rewrite the toml
-    print(toml.dumps(parsed_toml))
+    # 5. Rewrite the toml
+    print(new_toml_text)
     backup = toml_path.with_suffix(".toml.bkup")
     if not backup.exists():
         toml_path.rename(backup)
-    with toml_path.open('w') as toml_file:
-        toml.dump(parsed_toml, toml_file)
+    toml_path.write_text(new_toml_text)
 
 
 class MatchingLines:
     """
-    Might be slightly smarter to use ``shlex`` to parse the lines instead of ``re``
+    Lines are classified by their leading words; see :func:`command_kind`.
     """
-    pat = re.compile(r"^(.*)$")
     cmd = "{0}"
     def __init__(self, lines: Optional[List[str]] = None) -> None:
         self.lines: List[str] = lines or []
-    def is_match(self, line: str) -> bool:
-        if match := self.pat.match(line):
-            self.lines.append(line)
-            return True
-        return False
     def from_path(self, path: Path) -> None:
         self.lines.append(self.cmd.format(str(path)))
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self.lines!r})"
 
 class Black(MatchingLines):
-    pat = re.compile(r"^\s*black\s+(.*)$")
     cmd = "black {0}"
 
 class Doctest(MatchingLines):
-    pat = re.compile(r"^\s*python\s+-m\s+doctest\s+(.*)$")
     cmd = "python -m doctest --option ELLIPSIS {0}"
 
 class Pytest(MatchingLines):
-    pat = re.compile(r"^\s*python\s+-m\s+pytest\s*(.*)$")
     cmd = "python -m pytest {0}"
 
 class Mypy(MatchingLines):
-    pat = re.compile(r"^\s*mypy\s+(.*)$")
     cmd = "mypy {0}"
 
 
+COMMANDS: Dict[str, Type[MatchingLines]] = {"black": Black, "mypy": Mypy}
+PYTHON_MODULES: Dict[str, Type[MatchingLines]] = {"doctest": Doctest, "pytest": Pytest}
+
+
+def command_kind(line: str) -> Optional[Type[MatchingLines]]:
+    """The kind of command, from its first word or its ``python -m`` module."""
+    words = line.split(None, 3)
+    if not words:
+        return None
+    if words[0] == "python":
+        if len(words) > 2 and words[1] == "-m":
+            return PYTHON_MODULES.get(words[2])
+        return None
+    return COMMANDS.get(words[0])
+
+
 def rewrite_section(config: configparser.ConfigParser, doctest_paths: List[Path]) -> None:
     """Enforces a common structure.
 
@@ -213,41 +224,68 @@ def rewrite_section(config: configparser.ConfigParser, doctest_paths: List[Path]
 
     mypy is optional, a few chapters have a testenv that extends base.
     """
-    black_lines = Black()
-    doctest_lines = Doctest()
-    pytest_lines = Pytest()
-    mypy_lines = Mypy()
-    other_lines = MatchingLines()
+    section = target_section(config)
+
+    # Extract the dependencies option and update the details on mypy800
+    deps = config.get(section, "deps")
+    config.set(section, "deps", mypy800_pat.sub(r"\g<1>0.812", deps))
+
+    # Replace the config section
+    new_commands = revised_commands(config.get(section, "commands"), doctest_paths)
+    config.set(section, "commands", "\n".join([""] + new_commands))
 
+
+def rewrite_tox_ini(tox_ini: str, doctest_paths: List[Path]) -> str:
+    """Makes the same changes as :func:`rewrite_section`, editing the text.
+
+    ``configparser`` is only used to find the section and read its commands;
+    everything outside the ``deps`` mypy800 line and the ``commands`` option
+    is left exactly as it was written.
+    """
+    config = configparser.ConfigParser()
+    config.read_string(tox_ini)
+    section = target_section(config)
+    new_commands = revised_commands(config.get(section, "commands"), doctest_paths)
+
+    header = re.search(rf"^\[{re.escape(section)}\][^\n]*\n", tox_ini, re.M)
+    assert header, f"No [{section}] in tox.ini"
+    next_header = re.compile(r"^\[", re.M).search(tox_ini, header.end())
+    end = next_header.start() if next_header else len(tox_ini)
+    body = mypy800_pat.sub(r"\g<1>0.812", tox_ini[header.end():end])
+
+    commands = commands_pat.search(body)
+    assert commands, f"No commands in [{section}]"
+    indent = commands.group(1) or "  "
+    new_option = "commands =\n" + "".join(f"{indent}{c}\n" for c in new_commands)
+    body = body[:commands.start()] + new_option + body[commands.end():]
+    return tox_ini[:header.end()] + body + tox_ini[end:]
+
+
+def target_section(config: configparser.ConfigParser) -> str:
+    """The section with the real commands."""
     # Two forms: [testenv] and [testenv:...] that refers to [base]
     # The reference has two subforms [testenv:pyxx] and [testenv:{mypy790, mypy800}-pyxx]
     # The mypy8xx is a moving target.
     testenvs = list(s for s in config.sections() if s.startswith("testenv"))
     if len(testenvs) == 1:
-        section = testenvs[0]
-    else:
-        # Pick one environment as the exemplar...
-        extended_commands = config.get(testenvs[0], "commands").splitlines()
-        xrefs = list(filter(None, (xref_pat.match(c) for c in extended_commands)))
-        section = xrefs[0].group(1)
+        return testenvs[0]
+    # Pick one environment as the exemplar...
+    extended_commands = config.get(testenvs[0], "commands").splitlines()
+    xrefs = list(filter(None, (xref_pat.match(c) for c in extended_commands)))
+    return xrefs[0].group(1)
 
-    # Extract the dependencies option and update the details on mypy800
-    deps = config.get(section, "deps")
-    # Replace line matching "mypy800: mypy==(.*)" with "mypy800: mypy==0.812"
-    new_deps = re.sub(r"^mypy800:\s+mypy==(.+?)$", "mypy800: mypy==0.812", deps, re.M)
-    config.set(section, "deps", new_deps)
+
+def revised_commands(commands: str, doctest_paths: List[Path]) -> List[str]:
+    """The commands in the standard order, with new doctest lines."""
+    collected = {kind: kind() for kind in (Black, Doctest, Pytest, Mypy)}
 
     # Extract the sequence of commands.
     # These will have been de-indented, it appears.
-    commands = config.get(section, "commands")
     for line in filter(None, commands.splitlines()):
-        any_match = False
-        for p in (black_lines, doctest_lines, pytest_lines, mypy_lines):
-            any_match = p.is_match(line)
-            if any_match:
-                break
-        if not any_match:
+        kind = command_kind(line)
+        if kind is None:
             raise ValueError(f"Didn't recognize {line!r}")
+        collected[kind].lines.append(line)
 
     # Replace the doctest lines with test_files names.
     new_doctest_lines = Doctest()
@@ -255,33 +293,51 @@ def rewrite_section(config: configparser.ConfigParser, doctest_paths: List[Path]
         new_doctest_lines.from_path(str(p))
 
     # Create the revised sequence of commands.
-    new_commands = [""]
-    for p in (black_lines, new_doctest_lines, pytest_lines, mypy_lines):
+    new_commands: List[str] = []
+    for p in (collected[Black], new_doctest_lines, collected[Pytest], collected[Mypy]):
         new_commands.extend(p.lines)
-
-    # Replace the config section
-    config.set(section, "commands", "\n".join(new_commands))
+    return new_commands
 
 
 xref_pat = re.compile(r"\{\[(\w+)\](\w+)\}")
 
+tox_ini_pat = re.compile(r'(legacy_tox_ini\s*=\s*""")(.*?)(""")', re.S)
+
+# Replace line matching "mypy800: mypy==(.*)" with "mypy800: mypy==0.812"
+mypy800_pat = re.compile(r"^([ \t]*mypy800:\s+mypy==).+$", re.M)
+
+# The commands option with its indented continuation lines.
+# Group 1 is the continuation indent.
+commands_pat = re.compile(
+    r"^commands[ \t]*[=:][^\n]*(?:\n|\Z)"
+    r"(?=([ \t]+)?)(?:[ \t]+\S[^\n]*(?:\n|\Z)|[ \t]*\n(?=[ \t]+\S))*",
+    re.M,
+)
+
 
 def extract_examples(base: Path) -> None:
     renderer = ExtractPython()
-    markdown = mistune.Markdown(renderer=renderer)
     config = configparser.ConfigParser()
 
-    chapters = base.glob("drafts/*.md")
+    drafts = base / "drafts"
+    if not drafts.is_dir():
+        return
+    with os.scandir(drafts) as entries:
+        chapters = [Path(e.path) for e in entries if e.name.endswith(".md")]
+    examples_written = False
     for source_path in chapters:
         text = source_path.read_text()
         renderer.count = 0
-        examples = markdown(text)
+        examples = render(text, renderer)
         if renderer.count > 0:
-            target = source_path.parent.parent / "docs" / source_path.name
+            target = base / "docs" / source_path.name
             make_example_doc(target, examples)
-            toml_path = source_path.parent.parent / "pyproject.toml"
-            update_pyproject_toml(toml_path)
-            print("---")
+            examples_written = True
+
+    # The doctest commands list every docs/*.md, so update once, after all are written.
+    if examples_written:
+        update_pyproject_toml(base / "pyproject.toml")
+        print("---")
 
 
 def test_make_example_doc(tmp_path, capsys):
@@ -295,6 +351,42 @@ def test_make_example_doc(tmp_path, capsys):
     out, err = capsys.readouterr()
     assert out.splitlines() == [str(target_path)]
 
+def test_render():
+    # Given
+    text = (
+        "# Title\n\nSome prose.\n\n## Model\n\n"
+        "```plantuml\n@startuml\nskinparam handwritten true\n```\n\n"
+        "```python\n# not a heading\n>>> 1 + 1\n2\n```\n"
+    )
+    # When
+    diagrams = FindDiagrams()
+    render(text, diagrams)
+    python = ExtractPython()
+    examples = render(text, python)
+    # Then
+    assert diagrams.diagrams == [
+        Diagram(
+            0,
+            ["@startuml", "'figure 0: Model'", "@startuml",
+             "skinparam handwritten true", "@enduml"]
+        )
+    ]
+    assert python.count == 1
+    assert examples == (
+        "\n# Title\n\n## Model\n\n```python\n# not a heading\n>>> 1 + 1\n2\n\n```\n"
+    )
+
+def test_render_round_trip():
+    # Given
+    docs_path = Path(__file__).parent.parent / "ch_02" / "docs" / "case_study_2.md"
+    text = docs_path.read_text()
+    # When
+    python = ExtractPython()
+    examples = render(text, python)
+    # Then
+    assert python.count == 6
+    assert examples + "\n" == text
+
 def test_rewrite_section():
     # Given
     commands = [
@@ -377,39 +469,40 @@ def test_update_pyproject_toml(tmp_path):
         'envlist = {mypy790, mypy800}-{py38, py39}\n'
         '\n'
         '[base]\n'
-        'deps = \n'
-        '\t-rrequirements.txt\n'
-        '\tblack\n'
-        '\tpytest==6.2.2\n'
-        '\ttox==3.20.0\n'
-        '\tmypy790: mypy==0.790\n'
-        '\tmypy800: mypy==0.812\n'
-        'setenv = \n'
-        '\tPYTHONPATH = {toxinidir}/src\n'
-        'commands = \n'
-        '\tblack src\n'
-        '\tpython -m doctest --option ELLIPSIS src/f1.py\n'
-        '\tpython -m doctest --option ELLIPSIS src/f3.py\n'
-        '\tpython -m doctest --option ELLIPSIS src/f2.py\n'
-        '\tmypy --strict --show-error-codes src\n'
+        'deps =\n'
+        '  -rrequirements.txt\n'
+        '  black\n'
+        '  pytest==6.2.2\n'
+        '  tox==3.20.0\n'
+        '  mypy790: mypy==0.790\n'
+        '  mypy800: mypy==0.812\n'
+        'setenv =\n'
+        '  PYTHONPATH = {toxinidir}/src\n'
+        'commands =\n'
+        '  black src\n'
+        '  python -m doctest --option ELLIPSIS src/f1.py\n'
+        '  python -m doctest --option ELLIPSIS src/f2.py\n'
+        '  python -m doctest --option ELLIPSIS src/f3.py\n'
+        '  mypy --strict --show-error-codes src\n'
         '\n'
         '[testenv:{mypy790, mypy800}-py38]\n'
-        'deps = \n'
-        '\t{[base]deps}\n'
-        'setenv = \n'
-        '\t{[base]setenv}\n'
-        'commands = \n'
-        '\t{[base]commands}\n'
-        '\tpython -m doctest --option ELLIPSIS docs/examples_38.md\n'
+        'deps =\n'
+        '  {[base]deps}\n'
+        'setenv =\n'
+        '  {[base]setenv}\n'
+        'commands =\n'
+        '  {[base]commands}\n'
+        '  python -m doctest --option ELLIPSIS docs/examples_38.md\n'
         '\n'
         '[testenv:{mypy790, mypy800}-py39]\n'
-        'deps = \n'
-        '\t{[base]deps}\n'
-        'setenv = \n'
-        '\t{[base]setenv}\n'
-        'commands = \n'
-        '\t{[base]commands}\n'
-        '\tpython -m doctest --option ELLIPSIS docs/examples.md\n'
+        'deps =\n'
+        '  {[base]deps}\n'
+        'setenv =\n'
+        '  {[base]setenv}\n'
+        'commands =\n'
+        '  {[base]commands}\n'
+        '  python -m doctest --option ELLIPSIS docs/examples.md\n'
+        '\n'
         '\n'
     )
     expected_toml_dict['tool'] = {"tox": {"legacy_tox_ini": expeected_legacy_tox_ini}}
@@ -418,6 +511,28 @@ def test_update_pyproject_toml(tmp_path):
     # Then
     assert (tmp_path / "pyproject.toml.bkup").exists()
 
+def test_update_pyproject_toml_splice(tmp_path):
+    # Given
+    project = '[project]\nname = "classifier"\n\n[tool.tox]\n'
+    target_path = tmp_path / "pyproject.toml"
+    target_path.write_text(
+        project
+        + 'legacy_tox_ini = """\n[testenv]\ndeps =\n  black\ncommands =\n'
+        + '  black src\n  python -m doctest --option ELLIPSIS src/old.py\n"""\n'
+    )
+    src_path = tmp_path / "src"
+    src_path.mkdir()
+    (src_path/"f1.py").write_text("#! f1.py")
+    # When
+    update_pyproject_toml(target_path)
+    # Then
+    assert target_path.read_text() == (
+        project
+        + 'legacy_tox_ini = """\n[testenv]\ndeps =\n  black\ncommands =\n'
+        + '  black src\n  python -m doctest --option ELLIPSIS src/f1.py\n"""\n'
+    )
+    assert (tmp_path / "pyproject.toml.bkup").exists()
+
 
 if __name__ == "__main__":
     extract_examples(Path.cwd()/"ch_13")
@@ -1,50 +1,83 @@
 """
 Recursive directory tree display.
-Uses asciitree.
+Draws the same ``+--`` outline as asciitree's ``LeftAligned``.
 """
 import argparse
+import os
 from pathlib import Path
 import sys
-from asciitree import LeftAligned  # type: ignore[import]
-from textwrap import indent
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 
 
 def display(tree: Dict[str, Any], prefix: int = 0) -> None:
-    for name in tree:
-        if tree[name]:  # Non-empty: i.e., a directory
-            print(indent(name, prefix * " "))
-            display(tree[name], prefix + 4)
-        else:
-            print(indent(name, prefix * " "))
+    pads: Dict[int, str] = {}
+    lines: List[str] = []
+    stack = [(name, tree[name], prefix) for name in reversed(tree)]
+    while stack:
+        name, subtree, depth = stack.pop()
+        if depth not in pads:
+            pads[depth] = depth * " "
+        lines.append(f"{pads[depth]}{name}\n")
+        stack.extend((n, subtree[n], depth + 4) for n in reversed(subtree))
+    sys.stdout.writelines(lines)
+
+
+def hidden(name: str) -> bool:
+    return name.startswith(".") or (name.startswith("__") and name.endswith("__"))
+
+
+def walk(directory: str, here: Dict[str, Any]) -> None:
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if hidden(name):
+                continue
+            if entry.is_dir():
+                walk(entry.path, here.setdefault(f"{name}/", {}))
+            else:
+                here.setdefault(name, {})
 
 
 def build(root: Path) -> Dict[str, Any]:
     tree: Dict[str, Dict[str, Any]] = {}
-    for path in root.glob("**/*"):
-        if any(n.startswith(".") for n in path.parts):
-            continue
-        if any(n.startswith("__") and n.endswith("__") for n in path.parts):
-            continue
-        here = tree
-        for name in path.parts[:-1]:
-            here = here.setdefault(f"{name}/", {})
-        if path.is_dir():
-            here.setdefault(f"{path.parts[-1]}/", {})
-        else:
-            here.setdefault(path.parts[-1], {})
+    here = tree
+    for name in root.parts:
+        here = here.setdefault(f"{name}/", {})
+    walk(str(root), here)
     return tree
 
 
+def draw(directory: str, prefix: str = "") -> Iterator[str]:
+    """Outline lines for everything below ``directory``, as it's scanned."""
+    with os.scandir(directory) as entries:
+        visible = [entry for entry in entries if not hidden(entry.name)]
+    for position, entry in enumerate(visible, start=1):
+        if entry.is_dir():
+            yield f"{prefix} +-- {entry.name}/"
+            tail = "    " if position == len(visible) else " |  "
+            yield from draw(entry.path, prefix + tail)
+        else:
+            yield f"{prefix} +-- {entry.name}"
+
+
+def draw_tree(root: Path) -> Iterator[str]:
+    """The root's own path is drawn as a chain of single children."""
+    first, *rest = root.parts or (".",)
+    yield f"{first}/"
+    prefix = ""
+    for name in rest:
+        yield f"{prefix} +-- {name}/"
+        prefix += "    "
+    yield from draw(str(root), prefix)
+
+
 def main(argv: List[str] = sys.argv[1:]) -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("directory", nargs=1, type=Path)
     options = parser.parse_args(argv)
     for directory in options.directory:
-        tree = build(directory)
-        tr = LeftAligned()
-        print(tr(tree))
-        # display(tree)
+        sys.stdout.writelines(f"{line}\n" for line in draw_tree(directory))
+        # display(build(directory))
 
 
 if __name__ == "__main__":